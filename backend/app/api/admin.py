@@ -1,15 +1,23 @@
-from typing import List, Dict, Any
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from bson import ObjectId
 from datetime import datetime, timedelta
-from app.models.user import UserResponse
-from app.models.order import OrderListResponse, OrderResponse, OrderItemBase
+from app.models.user import UserResponse, user_to_response
+from app.models.order import OrderListResponse, OrderResponse, OrderStatus, order_to_response
 from app.core.database import get_users_collection, get_products_collection, get_orders_collection, get_order_items_collection
-from app.api.auth import get_current_user_obj
+from app.core.order_store import load_order_items, all_order_items_pipeline
+from app.core.order_archive import find_order, archived_order_summary, archived_product_sales_pipeline
+from app.core.fields import parse_fields, build_projection, sparse_response
+from app.core.responses import respond
+from app.core.cache import user_cache, token_version_cache
+from app.core.product_cache import get_product_by_id, product_cache
+from app.core.outbox import outbox_stats
+from app.api.auth import get_current_principal
+from app.api.orders import build_order_filter, list_orders
 
 router = APIRouter()
 
-def require_admin(current_user = Depends(get_current_user_obj)):
+def require_admin(current_user = Depends(get_current_principal)):
     """确保当前用户是管理员"""
     if not current_user.get("is_admin", False):
         raise HTTPException(
@@ -28,11 +36,14 @@ async def get_system_stats(current_user = Depends(require_admin)):
     # 获取统计数据
     total_users = await users_collection.count_documents({})
     total_products = await products_collection.count_documents({})
-    total_orders = await orders_collection.count_documents({})
     
-    # 计算总收入
-    orders = await orders_collection.find().to_list(length=None)
-    total_revenue = sum(order.get("total_amount", 0) for order in orders)
+    # 订单数与总收入按状态分组统计，已归档的订单从归档时写入的汇总中读取
+    status_groups = await orders_collection.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}}
+    ]).to_list(length=None)
+    archived = await archived_order_summary()
+    total_orders = sum(group["count"] for group in status_groups) + archived["order_count"]
+    total_revenue = sum(group["revenue"] for group in status_groups) + archived["revenue"]
     
     # 获取今日数据
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -51,10 +62,10 @@ async def get_system_stats(current_user = Depends(require_admin)):
     out_of_stock_products = await products_collection.count_documents({"stock": 0})
     
     # 订单状态统计
+    counts = {group["_id"]: group["count"] for group in status_groups}
     status_stats = {}
     for status in ["pending", "paid", "shipped", "delivered", "cancelled"]:
-        count = await orders_collection.count_documents({"status": status})
-        status_stats[status] = count
+        status_stats[status] = counts.get(status, 0) + archived["status_counts"].get(status, 0)
     
     return {
         "total_users": total_users,
@@ -70,25 +81,27 @@ async def get_system_stats(current_user = Depends(require_admin)):
 
 @router.get("/users", response_model=List[UserResponse], summary="获取用户列表")
 async def get_all_users(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的用户数量"),
     limit: int = Query(20, ge=1, le=100, description="返回的用户数量"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 id,username"),
     current_user = Depends(require_admin)
 ):
-    """获取所有用户列表（仅管理员）"""
+    """获取所有用户列表（仅管理员），支持字段裁剪"""
     users_collection = get_users_collection()
     
-    cursor = users_collection.find().skip(skip).limit(limit).sort("created_at", -1)
+    # 不读取密码哈希等无关字段
+    selected_fields = parse_fields(fields, UserResponse) or list(UserResponse.model_fields)
+    projection = build_projection(selected_fields, {"id": "_id"})
+    
+    cursor = users_collection.find({}, projection).skip(skip).limit(limit).sort("created_at", -1)
     users = await cursor.to_list(length=limit)
     
-    return [
-        UserResponse(
-            id=str(user["_id"]),
-            username=user["username"],
-            is_admin=user.get("is_admin", False),
-            created_at=user["created_at"]
-        )
-        for user in users
-    ]
+    if fields:
+        rows = [{**user, "id": str(user["_id"]), "is_admin": user.get("is_admin", False)} for user in users]
+        return sparse_response(UserResponse, selected_fields, rows, response)
+    
+    return respond([user_to_response(user) for user in users])
 
 @router.get("/recent-activities", summary="获取最近活动")
 async def get_recent_activities(current_user = Depends(require_admin)):
@@ -131,8 +144,6 @@ async def get_recent_activities(current_user = Depends(require_admin)):
 @router.get("/dashboard", summary="获取管理员仪表板数据")
 async def get_dashboard_data(current_user = Depends(require_admin)):
     """获取管理员仪表板数据（仅管理员）"""
-    users_collection = get_users_collection()
-    products_collection = get_products_collection()
     orders_collection = get_orders_collection()
     
     # 基础统计
@@ -166,23 +177,24 @@ async def get_dashboard_data(current_user = Depends(require_admin)):
             "revenue": day_revenue
         })
     
-    # 热门商品（根据订单数量）
+    # 热门商品（根据订单数量，同时统计 order_items 集合、内嵌在订单中的订单项与已归档订单的商品销量汇总）
     order_items_collection = get_order_items_collection()
-    pipeline = [
+    pipeline = all_order_items_pipeline([
+        archived_product_sales_pipeline(),
         {"$group": {
             "_id": "$product_id",
             "total_quantity": {"$sum": "$quantity"},
-            "total_orders": {"$sum": 1}
+            "total_orders": {"$sum": {"$ifNull": ["$order_count", 1]}}
         }},
         {"$sort": {"total_quantity": -1}},
         {"$limit": 5}
-    ]
+    ])
     
     top_products_data = await order_items_collection.aggregate(pipeline).to_list(length=5)
     top_products = []
     
     for item in top_products_data:
-        product = await products_collection.find_one({"_id": ObjectId(item["_id"])})
+        product = await get_product_by_id(item["_id"])
         if product:
             top_products.append({
                 "product_id": item["_id"],
@@ -211,55 +223,62 @@ async def set_user_admin(
             detail="无效的用户ID"
         )
     
-    users_collection = get_users_collection()
-    
-    # 检查用户是否存在
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-    
     # 不能修改自己的权限
-    if str(user["_id"]) == str(current_user["_id"]):
+    if user_id == str(current_user["_id"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="不能修改自己的管理员权限"
         )
     
-    # 更新用户权限
-    await users_collection.update_one(
+    users_collection = get_users_collection()
+    
+    # 更新用户权限，同时提升令牌版本使已签发的令牌失效
+    user = await users_collection.find_one_and_update(
         {"_id": ObjectId(user_id)},
-        {"$set": {"is_admin": is_admin}}
+        {"$set": {"is_admin": is_admin}, "$inc": {"token_version": 1}},
+        projection={"username": 1}
     )
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="用户不存在"
+        )
+    user_cache.invalidate(user["username"])
+    token_version_cache.invalidate(user_id)
     
     action = "设置为管理员" if is_admin else "取消管理员权限"
     return {"message": f"已{action}用户 {user['username']}"}
 
+@router.get("/cache-stats", summary="获取缓存命中统计")
+async def get_cache_stats(current_user = Depends(require_admin)):
+    """获取进程内缓存的命中统计（仅管理员）"""
+    return {
+        "user_cache": user_cache.stats(),
+        "token_version_cache": token_version_cache.stats(),
+        "product_cache": product_cache.stats()
+    }
+
+@router.get("/outbox-stats", summary="获取下单后续处理事件统计")
+async def get_outbox_stats(current_user = Depends(require_admin)):
+    """获取 outbox 各状态的事件数量（仅管理员），failed 为重试次数用尽的事件"""
+    return await outbox_stats()
+
 @router.get("/orders", response_model=List[OrderListResponse], summary="获取所有订单列表")
-async def get_all_orders(current_user = Depends(require_admin)):
-    """获取所有用户的订单列表（仅管理员）"""
-    orders_collection = get_orders_collection()
-    order_items_collection = get_order_items_collection()
-    
-    orders = await orders_collection.find().sort("created_at", -1).to_list(length=None)
+async def get_all_orders(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="返回的订单数量"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    order_status: Optional[OrderStatus] = Query(None, alias="status", description="按订单状态过滤"),
+    created_from: Optional[datetime] = Query(None, description="创建时间下限（包含）"),
+    created_to: Optional[datetime] = Query(None, description="创建时间上限（不包含）"),
+    all_orders: bool = Query(False, alias="all", description="不分页，返回全部订单（数据量大时慎用）"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 id,order_number,status"),
+    current_user = Depends(require_admin)
+):
+    """获取所有用户的订单列表（仅管理员，包括已归档的订单），支持状态与时间过滤、游标分页和字段裁剪"""
+    query = build_order_filter(order_status, created_from, created_to)
     
-    order_list = []
-    for order in orders:
-        # 获取订单项数量
-        items_count = await order_items_collection.count_documents({"order_id": str(order["_id"])})
-        
-        order_list.append(OrderListResponse(
-            id=str(order["_id"]),
-            order_number=order["order_number"],
-            total_amount=order["total_amount"],
-            status=order["status"],
-            created_at=order["created_at"],
-            item_count=items_count
-        ))
-    
-    return order_list
+    return await list_orders(query, response, fields, limit, cursor, all_orders)
 
 @router.get("/orders/{order_id}", response_model=OrderResponse, summary="获取任意订单详情")
 async def get_any_order(order_id: str, current_user = Depends(require_admin)):
@@ -270,11 +289,8 @@ async def get_any_order(order_id: str, current_user = Depends(require_admin)):
             detail="无效的订单ID"
         )
     
-    orders_collection = get_orders_collection()
-    order_items_collection = get_order_items_collection()
-    
-    # 查找订单
-    order = await orders_collection.find_one({"_id": ObjectId(order_id)})
+    # 查找订单（包括已归档的订单）
+    order = await find_order({"_id": ObjectId(order_id)})
     
     if not order:
         raise HTTPException(
@@ -283,24 +299,6 @@ async def get_any_order(order_id: str, current_user = Depends(require_admin)):
         )
     
     # 获取订单项
-    order_items = await order_items_collection.find({"order_id": order_id}).to_list(length=None)
-    
-    items = [
-        OrderItemBase(
-            product_id=item["product_id"],
-            product_name=item["product_name"],
-            product_price=item["product_price"],
-            quantity=item["quantity"],
-            subtotal=item["subtotal"]
-        )
-        for item in order_items
-    ]
-    
-    return OrderResponse(
-        id=str(order["_id"]),
-        order_number=order["order_number"],
-        total_amount=order["total_amount"],
-        status=order["status"],
-        created_at=order["created_at"],
-        items=items
-    ) 
\ No newline at end of file
+    order_items = await load_order_items(order)
+    
+    return respond(order_to_response(order, order_items)) 
\ No newline at end of file
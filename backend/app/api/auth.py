@@ -1,13 +1,34 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPAuthorizationCredentials
 from datetime import datetime
+from typing import Optional
 from app.models.user import UserCreate, UserLogin, Token, User, UserResponse
-from app.core.security import get_password_hash, verify_password, create_access_token, verify_token
+from app.core.security import get_password_hash_async, verify_password_async, create_access_token, verify_token, verify_token_payload
+from app.core.config import settings
 from app.core.database import get_users_collection
+from app.core.cache import user_cache, token_version_cache
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
+def create_user_token(user: dict) -> str:
+    """为用户签发访问令牌（携带无状态认证所需的声明）"""
+    return create_access_token(data={
+        "sub": user["username"],
+        "uid": str(user["_id"]),
+        "adm": user.get("is_admin", False),
+        "ver": user.get("token_version", 0)
+    })
+
+def _token_revoked_exception() -> HTTPException:
+    """构造令牌失效异常"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="令牌已失效，请重新登录",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 @router.post("/register", response_model=Token, summary="用户注册")
 async def register(user: UserCreate):
     """
@@ -17,32 +38,30 @@ async def register(user: UserCreate):
     """
     users_collection = get_users_collection()
     
-    # 检查用户名是否已存在
-    existing_user = await users_collection.find_one({"username": user.username})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="用户名已存在"
-        )
-    
-    # 创建新用户
+    # 创建新用户，用户名唯一性由 username 唯一索引保证
     user_dict = user.dict()
-    user_dict["hashed_password"] = get_password_hash(user.password)
+    user_dict["hashed_password"] = await get_password_hash_async(user.password)
     del user_dict["password"]
     user_dict["is_admin"] = False
     user_dict["created_at"] = datetime.utcnow()
     
-    result = await users_collection.insert_one(user_dict)
-    created_user = await users_collection.find_one({"_id": result.inserted_id})
+    try:
+        await users_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用户名已存在"
+        )
+    user_cache.invalidate(user.username)
     
-    # 生成token
-    access_token = create_access_token(data={"sub": user.username})
+    # 生成token（insert_one 已将 _id 写回 user_dict）
+    access_token = create_user_token(user_dict)
     
     user_response = UserResponse(
-        id=str(created_user["_id"]),
-        username=created_user["username"],
-        is_admin=created_user["is_admin"],
-        created_at=created_user["created_at"]
+        id=str(user_dict["_id"]),
+        username=user_dict["username"],
+        is_admin=user_dict["is_admin"],
+        created_at=user_dict["created_at"]
     )
     
     return Token(access_token=access_token, user=user_response)
@@ -58,7 +77,7 @@ async def login(user_credentials: UserLogin):
     
     # 查找用户
     user = await users_collection.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+    if not user or not await verify_password_async(user_credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -66,7 +85,7 @@ async def login(user_credentials: UserLogin):
         )
     
     # 生成token
-    access_token = create_access_token(data={"sub": user["username"]})
+    access_token = create_user_token(user)
     
     user_response = UserResponse(
         id=str(user["_id"]),
@@ -96,14 +115,59 @@ async def get_current_user(username: str = Depends(verify_token)):
         created_at=user["created_at"]
     )
 
-async def get_current_user_obj(username: str = Depends(verify_token)):
-    """获取当前用户对象（内部使用）"""
-    users_collection = get_users_collection()
+async def get_current_user_obj(payload: dict = Depends(verify_token_payload)):
+    """获取当前用户对象（内部使用，优先读取用户缓存）"""
+    username = payload["sub"]
+    user = user_cache.get(username)
+    if user is None:
+        users_collection = get_users_collection()
+        
+        user = await users_collection.find_one({"username": username})
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="用户不存在"
+            )
+        
+        user_cache.set(username, user)
     
-    user = await users_collection.find_one({"username": username})
+    # 校验令牌版本，管理员权限变更后旧令牌立即失效
+    if "uid" in payload and payload["uid"] != str(user["_id"]):
+        raise _token_revoked_exception()
+    if "ver" in payload and payload["ver"] != user.get("token_version", 0):
+        raise _token_revoked_exception()
+    return user
+
+async def get_token_version(user_id: str) -> Optional[int]:
+    """获取用户当前令牌版本（带缓存），用户不存在时返回 None"""
+    token_version = token_version_cache.get(user_id)
+    if token_version is not None:
+        return token_version
+    
+    users_collection = get_users_collection()
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"token_version": 1})
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-    return user 
\ No newline at end of file
+        return None
+    
+    token_version = user.get("token_version", 0)
+    token_version_cache.set(user_id, token_version)
+    return token_version
+
+async def get_current_principal(payload: dict = Depends(verify_token_payload)):
+    """获取当前用户身份（无状态认证模式下直接使用令牌声明，不查询用户）
+    
+    返回的字典只保证包含 _id、username、is_admin 三个字段。
+    """
+    if not settings.AUTH_STATELESS or "uid" not in payload:
+        return await get_current_user_obj(payload)
+    
+    user_id = payload["uid"]
+    token_version = await get_token_version(user_id)
+    if token_version is None or payload.get("ver", 0) != token_version:
+        raise _token_revoked_exception()
+    
+    return {
+        "_id": ObjectId(user_id),
+        "username": payload["sub"],
+        "is_admin": payload.get("adm", False)
+    }
@@ -1,54 +1,125 @@
-from typing import List
+from typing import Dict, List, Optional
 from fastapi import APIRouter, HTTPException, status, Depends
 from bson import ObjectId
-from datetime import datetime
-from app.models.cart import CartItemCreate, CartItemUpdate, CartItemResponse, CartResponse
-from app.core.database import get_cart_collection, get_products_collection
-from app.api.auth import get_current_user_obj
+from app.models.cart import CartItemCreate, CartItemUpdate, CartItemResponse, CartResponse, CartBulkUpdate, CartOperationType, cart_item_to_response
+from app.core.config import settings
+from app.core.cart_store import get_cart_store
+from app.core.responses import respond
+from app.core.product_cache import get_product_by_id, get_products_by_ids
+from app.api.auth import get_current_principal
 
 router = APIRouter()
 
-@router.get("/", response_model=CartResponse, summary="获取购物车")
-async def get_cart(current_user = Depends(get_current_user_obj)):
-    """获取当前用户的购物车内容"""
-    cart_collection = get_cart_collection()
-    products_collection = get_products_collection()
-    
-    user_id = str(current_user["_id"])
-    cart_items = await cart_collection.find({"user_id": user_id}).to_list(length=None)
+async def _build_cart_response(cart_items: List[dict]) -> dict:
+    """组装 CartResponse 结构，商品信息一次批量读取（已删除的商品不会出现在结果中）"""
+    products = await get_products_by_ids(cart_item["product_id"] for cart_item in cart_items)
     
     items = []
     total_amount = 0
     total_items = 0
     
     for cart_item in cart_items:
-        # 获取商品信息
-        product = await products_collection.find_one({"_id": ObjectId(cart_item["product_id"])})
+        product = products.get(cart_item["product_id"])
         if product:
-            subtotal = product["price"] * cart_item["quantity"]
-            items.append(CartItemResponse(
-                id=str(cart_item["_id"]),
-                product_id=cart_item["product_id"],
-                quantity=cart_item["quantity"],
-                product_name=product["name"],
-                product_price=product["price"],
-                product_image_url=product["image_url"],
-                subtotal=subtotal,
-                created_at=cart_item["created_at"]
-            ))
-            total_amount += subtotal
+            item = cart_item_to_response(cart_item, product)
+            items.append(item)
+            total_amount += item["subtotal"]
             total_items += cart_item["quantity"]
     
-    return CartResponse(
-        items=items,
-        total_amount=total_amount,
-        total_items=total_items
+    return {
+        "items": items,
+        "total_amount": total_amount,
+        "total_items": total_items
+    }
+
+@router.get("/", response_model=CartResponse, summary="获取购物车")
+async def get_cart(current_user = Depends(get_current_principal)):
+    """获取当前用户的购物车内容"""
+    cart_store = get_cart_store()
+    
+    user_id = str(current_user["_id"])
+    cart_items = await cart_store.list_items(user_id)
+    
+    return respond(await _build_cart_response(cart_items))
+
+@router.patch("/", response_model=CartResponse, summary="批量修改购物车")
+async def bulk_update_cart(
+    update: CartBulkUpdate,
+    current_user = Depends(get_current_principal)
+):
+    """
+    批量修改购物车，按顺序执行一组操作，全部校验通过后一次写入
+    - **set**: 设置商品数量（不在购物车中时加入）
+    - **increment**: 增加商品数量（不在购物车中时加入）
+    - **remove**: 移除商品（不在购物车中时忽略）
+    """
+    operations = update.operations
+    if len(operations) > settings.CART_BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多执行 {settings.CART_BULK_MAX_OPERATIONS} 个操作"
+        )
+    
+    for operation in operations:
+        if not ObjectId.is_valid(operation.product_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的商品ID: {operation.product_id}"
+            )
+        if operation.op != CartOperationType.REMOVE and operation.quantity is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{operation.op.value} 操作必须提供数量"
+            )
+    
+    cart_store = get_cart_store()
+    user_id = str(current_user["_id"])
+    
+    # 当前购物车与所有涉及的商品各读取一次
+    cart_items = await cart_store.list_items(user_id)
+    products = await get_products_by_ids(
+        [cart_item["product_id"] for cart_item in cart_items] +
+        [operation.product_id for operation in operations if operation.op != CartOperationType.REMOVE]
     )
+    
+    # 在购物车快照上依次执行操作，得到每个受影响商品的目标数量（None 表示移除）
+    quantities = {cart_item["product_id"]: cart_item["quantity"] for cart_item in cart_items}
+    changes: Dict[str, Optional[int]] = {}
+    for operation in operations:
+        product_id = operation.product_id
+        if operation.op == CartOperationType.REMOVE:
+            quantity = None
+        else:
+            if product_id not in products:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"商品不存在: {product_id}"
+                )
+            if operation.op == CartOperationType.SET:
+                quantity = operation.quantity
+            else:
+                quantity = (quantities.get(product_id) or 0) + operation.quantity
+        quantities[product_id] = quantity
+        changes[product_id] = quantity
+    
+    # 检查库存
+    for product_id, quantity in changes.items():
+        if quantity is not None and quantity > products[product_id]["stock"]:
+            product = products[product_id]
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"商品 {product['name']} 库存不足，当前库存：{product['stock']}"
+            )
+    
+    await cart_store.apply_quantities(user_id, changes)
+    
+    cart_items = await cart_store.list_items(user_id)
+    return respond(await _build_cart_response(cart_items))
 
 @router.post("/items", response_model=CartItemResponse, summary="添加商品到购物车")
 async def add_to_cart(
     item: CartItemCreate,
-    current_user = Depends(get_current_user_obj)
+    current_user = Depends(get_current_principal)
 ):
     """添加商品到购物车"""
     if not ObjectId.is_valid(item.product_id):
@@ -57,11 +128,10 @@ async def add_to_cart(
             detail="无效的商品ID"
         )
     
-    cart_collection = get_cart_collection()
-    products_collection = get_products_collection()
+    cart_store = get_cart_store()
     
     # 检查商品是否存在
-    product = await products_collection.find_one({"_id": ObjectId(item.product_id)})
+    product = await get_product_by_id(item.product_id)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,61 +147,21 @@ async def add_to_cart(
     
     user_id = str(current_user["_id"])
     
-    # 检查购物车中是否已存在该商品
-    existing_item = await cart_collection.find_one({
-        "user_id": user_id,
-        "product_id": item.product_id
-    })
-    
-    if existing_item:
-        # 更新数量
-        new_quantity = existing_item["quantity"] + item.quantity
-        if new_quantity > product["stock"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"库存不足，当前库存：{product['stock']}"
-            )
-        
-        await cart_collection.update_one(
-            {"_id": existing_item["_id"]},
-            {
-                "$set": {
-                    "quantity": new_quantity,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+    # 一次条件更新完成累加或新增，累加后的数量不超过库存
+    cart_item = await cart_store.add_quantity(user_id, item.product_id, item.quantity, product["stock"])
+    if not cart_item:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"库存不足，当前库存：{product['stock']}"
         )
-        
-        updated_item = await cart_collection.find_one({"_id": existing_item["_id"]})
-        cart_item = updated_item
-    else:
-        # 创建新的购物车项
-        cart_item_dict = item.dict()
-        cart_item_dict["user_id"] = user_id
-        cart_item_dict["created_at"] = datetime.utcnow()
-        cart_item_dict["updated_at"] = datetime.utcnow()
-        
-        result = await cart_collection.insert_one(cart_item_dict)
-        cart_item = await cart_collection.find_one({"_id": result.inserted_id})
-    
-    subtotal = product["price"] * cart_item["quantity"]
-    
-    return CartItemResponse(
-        id=str(cart_item["_id"]),
-        product_id=cart_item["product_id"],
-        quantity=cart_item["quantity"],
-        product_name=product["name"],
-        product_price=product["price"],
-        product_image_url=product["image_url"],
-        subtotal=subtotal,
-        created_at=cart_item["created_at"]
-    )
+    
+    return respond(cart_item_to_response(cart_item, product))
 
 @router.put("/items/{item_id}", response_model=CartItemResponse, summary="更新购物车商品数量")
 async def update_cart_item(
     item_id: str,
     item_update: CartItemUpdate,
-    current_user = Depends(get_current_user_obj)
+    current_user = Depends(get_current_principal)
 ):
     """更新购物车中商品的数量"""
     if not ObjectId.is_valid(item_id):
@@ -140,66 +170,39 @@ async def update_cart_item(
             detail="无效的购物车项ID"
         )
     
-    cart_collection = get_cart_collection()
-    products_collection = get_products_collection()
+    cart_store = get_cart_store()
     
     user_id = str(current_user["_id"])
+    quantity = item_update.quantity
     
-    # 查找购物车项
-    cart_item = await cart_collection.find_one({
-        "_id": ObjectId(item_id),
-        "user_id": user_id
-    })
-    
-    if not cart_item:
+    # 一次 find_one_and_update 修改数量并取回修改前的购物车项（购物车项ID不包含商品ID，库存在写入后校验）
+    previous_item = await cart_store.set_item_quantity(user_id, item_id, quantity)
+    if not previous_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="购物车项不存在"
         )
     
-    # 检查商品库存
-    product = await products_collection.find_one({"_id": ObjectId(cart_item["product_id"])})
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="商品不存在"
-        )
-    
-    if product["stock"] < item_update.quantity:
+    # 检查商品库存（读穿缓存），不满足时恢复原数量（期间数量已被其他请求修改则保留其修改）
+    product = await get_product_by_id(previous_item["product_id"])
+    if not product or product["stock"] < quantity:
+        await cart_store.set_item_quantity(user_id, item_id, previous_item["quantity"], expected_quantity=quantity)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="商品不存在"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"库存不足，当前库存：{product['stock']}"
         )
     
-    # 更新数量
-    await cart_collection.update_one(
-        {"_id": ObjectId(item_id)},
-        {
-            "$set": {
-                "quantity": item_update.quantity,
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
-    
-    updated_item = await cart_collection.find_one({"_id": ObjectId(item_id)})
-    subtotal = product["price"] * updated_item["quantity"]
-    
-    return CartItemResponse(
-        id=str(updated_item["_id"]),
-        product_id=updated_item["product_id"],
-        quantity=updated_item["quantity"],
-        product_name=product["name"],
-        product_price=product["price"],
-        product_image_url=product["image_url"],
-        subtotal=subtotal,
-        created_at=updated_item["created_at"]
-    )
+    return respond(cart_item_to_response({**previous_item, "quantity": quantity}, product))
 
 @router.delete("/items/{item_id}", summary="从购物车删除商品")
 async def remove_from_cart(
     item_id: str,
-    current_user = Depends(get_current_user_obj)
+    current_user = Depends(get_current_principal)
 ):
     """从购物车中删除商品"""
     if not ObjectId.is_valid(item_id):
@@ -208,16 +211,13 @@ async def remove_from_cart(
             detail="无效的购物车项ID"
         )
     
-    cart_collection = get_cart_collection()
+    cart_store = get_cart_store()
     user_id = str(current_user["_id"])
     
     # 查找并删除购物车项
-    result = await cart_collection.delete_one({
-        "_id": ObjectId(item_id),
-        "user_id": user_id
-    })
+    removed = await cart_store.remove_item(user_id, item_id)
     
-    if result.deleted_count == 0:
+    if not removed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="购物车项不存在"
@@ -226,11 +226,11 @@ async def remove_from_cart(
     return {"message": "商品已从购物车中移除"}
 
 @router.delete("/clear", summary="清空购物车")
-async def clear_cart(current_user = Depends(get_current_user_obj)):
+async def clear_cart(current_user = Depends(get_current_principal)):
     """清空当前用户的购物车"""
-    cart_collection = get_cart_collection()
+    cart_store = get_cart_store()
     user_id = str(current_user["_id"])
     
-    await cart_collection.delete_many({"user_id": user_id})
+    await cart_store.clear(user_id)
     
     return {"message": "购物车已清空"} 
\ No newline at end of file
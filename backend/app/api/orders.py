@@ -1,38 +1,106 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Request, Response
 from bson import ObjectId
 from datetime import datetime
 import uuid
-from app.models.order import OrderCreate, OrderResponse, OrderListResponse, OrderItemBase, OrderStatus
-from app.core.database import get_orders_collection, get_order_items_collection, get_cart_collection, get_products_collection
-from app.api.auth import get_current_user_obj
+from app.models.order import OrderCreate, FlashSaleOrderCreate, OrderResponse, OrderListResponse, OrderItemBase, OrderStatus, order_to_response, order_to_list_response
+from app.core.config import settings
+from app.core.database import database
+from app.core.order_store import insert_order, delete_orders, load_order_items, with_item_count, fill_item_counts
+from app.core.order_archive import find_order, find_orders
+from app.core.inventory import reserve_stock, release_stock
+from app.core.idempotency import IDEMPOTENCY_KEY_HEADER, claim_idempotency_key, complete_idempotency_key, release_idempotency_key, replay_response
+from app.core.cart_store import get_cart_store
+from app.core.order_events import publish_order_created
+from app.core.outbox import wake_outbox_workers
+from app.core.flash_sale import flash_sale_inventory, submit_flash_sale_order
+from app.core.fields import parse_fields, build_projection, sparse_response
+from app.core.pagination import NEXT_CURSOR_HEADER, encode_cursor, apply_cursor
+from app.core.http_cache import PRIVATE_REVALIDATE, make_etag, conditional_response
+from app.core.responses import respond
+from app.core.product_cache import get_product_by_id, get_products_by_ids, invalidate_product
+from app.api.auth import get_current_principal
 
 router = APIRouter()
 
-@router.post("/", response_model=OrderResponse, summary="创建订单")
-async def create_order(current_user = Depends(get_current_user_obj)):
-    """从购物车创建订单"""
-    cart_collection = get_cart_collection()
-    products_collection = get_products_collection()
-    orders_collection = get_orders_collection()
-    order_items_collection = get_order_items_collection()
+# 下单接口的幂等键作用域
+CREATE_ORDER_SCOPE = "create_order"
+
+# 订单列表按创建时间倒序，_id 保证顺序唯一（游标分页依赖）
+ORDER_SORT = [("created_at", -1), ("_id", -1)]
+
+def generate_order_number() -> str:
+    """生成订单号"""
+    return f"EC{datetime.utcnow().strftime('%Y%m%d')}{uuid.uuid4().hex[:8].upper()}"
+
+def order_version(order: dict) -> str:
+    """订单内容版本（订单项创建后不再变化，只需关注订单状态）"""
+    changed_at = order.get("updated_at") or order["created_at"]
+    return f"{order['_id']}:{order['status']}:{changed_at.isoformat()}"
+
+async def _place_order(order_dict: dict, order_items: List[OrderItemBase], session=None) -> None:
+    """扣减库存，写入订单、订单项与下单事件，并从购物车移除已下单的商品"""
+    quantities = {item.product_id: item.quantity for item in order_items}
+    hold_id = str(order_dict["_id"])
+    failed = await reserve_stock(quantities, hold_id, session=session)
+    if failed:
+        names = {item.product_id: item.product_name for item in order_items}
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"商品 {'、'.join(names[product_id] for product_id in failed)} 库存不足"
+        )
     
-    user_id = str(current_user["_id"])
+    items = [item.dict() for item in order_items]
+    try:
+        # 下单事件先于订单写入，保证订单存在时一定有对应的事件
+        await publish_order_created(order_dict, items, session=session)
+        await insert_order(order_dict, items, session=session)
+        
+        # 只移除下单后没有修改过的购物车项；一项都没有移除说明这些商品已被另一个下单请求取走（如重复提交）
+        removed = await get_cart_store().remove_products(
+            order_dict["user_id"],
+            [item.product_id for item in order_items],
+            order_dict["created_at"],
+            session=session
+        )
+        if not removed:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="购物车已变化，请刷新后重试"
+            )
+    except Exception:
+        # 事务中由回滚处理，否则删除可能已写入的订单并归还已扣减的库存
+        if session is None:
+            await delete_orders([order_dict["_id"]])
+            await release_stock(quantities, hold_id)
+        raise
+
+async def _checkout(user_id: str, order_id: Optional[ObjectId] = None) -> dict:
+    """从购物车创建订单（order_id 为预先生成的订单ID），返回 OrderResponse 结构"""
+    cart_store = get_cart_store()
     
     # 获取购物车内容
-    cart_items = await cart_collection.find({"user_id": user_id}).to_list(length=None)
+    cart_items = await cart_store.list_items(user_id)
     if not cart_items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="购物车为空"
         )
     
-    # 验证库存并计算总金额
+    # 一次批量读取最新的商品信息，预先校验库存并计算总金额
+    products = await get_products_by_ids((cart_item["product_id"] for cart_item in cart_items), fresh=True)
     order_items = []
     total_amount = 0
     
     for cart_item in cart_items:
-        product = await products_collection.find_one({"_id": ObjectId(cart_item["product_id"])})
+        # 秒杀商品的库存由进程内计数管理，只能通过秒杀接口下单
+        if flash_sale_inventory.is_flash_sale(cart_item["product_id"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"秒杀商品请通过秒杀下单: {cart_item['product_id']}"
+            )
+        
+        product = products.get(cart_item["product_id"])
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -56,72 +124,214 @@ async def create_order(current_user = Depends(get_current_user_obj)):
             subtotal=subtotal
         ))
     
-    # 生成订单号
-    order_number = f"EC{datetime.utcnow().strftime('%Y%m%d')}{uuid.uuid4().hex[:8].upper()}"
-    
-    # 创建订单
+    # 创建订单（预先生成 _id，写入失败时据此清理）
     order_dict = {
+        "_id": order_id or ObjectId(),
         "user_id": user_id,
-        "order_number": order_number,
+        "order_number": generate_order_number(),
         "total_amount": total_amount,
         "status": OrderStatus.PAID,
         "created_at": datetime.utcnow()
     }
     
-    order_result = await orders_collection.insert_one(order_dict)
-    order_id = str(order_result.inserted_id)
+    # 按条件扣减库存（并发下单不会超卖）并写入订单
+    try:
+        if settings.ORDER_TRANSACTIONS:
+            # with_transaction 会在写冲突等临时错误时自动重试整个事务
+            async with await database.client.start_session() as session:
+                await session.with_transaction(
+                    lambda session: _place_order(order_dict, order_items, session=session)
+                )
+        else:
+            await _place_order(order_dict, order_items)
+    finally:
+        for item in order_items:
+            invalidate_product(item.product_id)
     
-    # 创建订单项并减少库存
-    for item in order_items:
-        order_item_dict = item.dict()
-        order_item_dict["order_id"] = order_id
-        await order_items_collection.insert_one(order_item_dict)
-        
-        # 减少商品库存
-        await products_collection.update_one(
-            {"_id": ObjectId(item.product_id)},
-            {"$inc": {"stock": -item.quantity}}
-        )
+    # 下单事件的后续处理由 outbox 处理任务完成
+    wake_outbox_workers()
     
-    # 清空购物车
-    await cart_collection.delete_many({"user_id": user_id})
+    return order_to_response(order_dict, [item.dict() for item in order_items])
+
+async def _recover_order(record: dict) -> Optional[Tuple[int, dict]]:
+    """幂等键的处理方中断时，按键上记录的订单ID查找已经写入的订单"""
+    order = await find_order({"_id": ObjectId(record["resource_id"])})
+    if not order:
+        return None
+    return status.HTTP_200_OK, order_to_response(order, await load_order_items(order))
+
+@router.post("/", response_model=OrderResponse, summary="创建订单")
+async def create_order(
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, description="幂等键，重试时携带相同的值不会重复下单"),
+    current_user = Depends(get_current_principal)
+):
+    """从购物车创建订单，携带 Idempotency-Key 时重复请求直接返回首次请求的结果"""
+    user_id = str(current_user["_id"])
+    if not idempotency_key:
+        return respond(await _checkout(user_id))
     
-    return OrderResponse(
-        id=order_id,
-        order_number=order_number,
-        total_amount=total_amount,
-        status=OrderStatus.PAID,
-        created_at=order_dict["created_at"],
-        items=order_items
+    # 订单ID随幂等键保存：处理方在写入订单后、保存结果前中断时，接管该键的请求据此返回已写入的订单而不是再次下单
+    order_id = ObjectId()
+    record = await claim_idempotency_key(
+        CREATE_ORDER_SCOPE, user_id, idempotency_key,
+        resource_id=str(order_id), recover=_recover_order
     )
+    if record is not None:
+        return replay_response(record, response)
+    
+    try:
+        order = await _checkout(user_id, order_id)
+    except HTTPException as error:
+        # 业务错误（如购物车为空、库存不足）同样保存，重试得到相同的结果
+        await complete_idempotency_key(CREATE_ORDER_SCOPE, user_id, idempotency_key, error.status_code, {"detail": error.detail})
+        raise
+    except BaseException:
+        await release_idempotency_key(CREATE_ORDER_SCOPE, user_id, idempotency_key)
+        raise
+    
+    await complete_idempotency_key(CREATE_ORDER_SCOPE, user_id, idempotency_key, status.HTTP_200_OK, order)
+    return respond(order, response)
 
-@router.get("/", response_model=List[OrderListResponse], summary="获取订单列表")
-async def get_orders(current_user = Depends(get_current_user_obj)):
-    """获取当前用户的订单列表"""
-    orders_collection = get_orders_collection()
-    order_items_collection = get_order_items_collection()
+@router.post("/flash-sale", response_model=OrderResponse, summary="秒杀下单")
+async def create_flash_sale_order(
+    order: FlashSaleOrderCreate,
+    current_user = Depends(get_current_principal)
+):
+    """
+    秒杀商品直接下单（不经过购物车）
+    先扣减进程内库存，售罄时不访问数据库直接返回；订单进入队列，由后台任务批量扣减数据库库存并写入
+    """
+    if not flash_sale_inventory.is_flash_sale(order.product_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="该商品未参加秒杀"
+        )
     
-    user_id = str(current_user["_id"])
-    orders = await orders_collection.find({"user_id": user_id}).sort("created_at", -1).to_list(length=None)
+    if order.quantity > settings.FLASH_SALE_MAX_QUANTITY:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"秒杀商品单次最多购买 {settings.FLASH_SALE_MAX_QUANTITY} 件"
+        )
     
-    order_list = []
-    for order in orders:
-        # 获取订单项数量
-        items_count = await order_items_collection.count_documents({"order_id": str(order["_id"])})
-        
-        order_list.append(OrderListResponse(
-            id=str(order["_id"]),
-            order_number=order["order_number"],
-            total_amount=order["total_amount"],
-            status=order["status"],
-            created_at=order["created_at"],
-            item_count=items_count
-        ))
+    if not flash_sale_inventory.try_reserve(order.product_id, order.quantity):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="商品已售罄"
+        )
+    
+    try:
+        product = await get_product_by_id(order.product_id)
+    except BaseException:
+        flash_sale_inventory.release(order.product_id, order.quantity)
+        raise
+    if not product:
+        flash_sale_inventory.release(order.product_id, order.quantity)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="商品不存在"
+        )
+    
+    subtotal = product["price"] * order.quantity
+    item = OrderItemBase(
+        product_id=order.product_id,
+        product_name=product["name"],
+        product_price=product["price"],
+        quantity=order.quantity,
+        subtotal=subtotal
+    ).dict()
+    order_dict = {
+        "_id": ObjectId(),
+        "user_id": str(current_user["_id"]),
+        "order_number": generate_order_number(),
+        "total_amount": subtotal,
+        "status": OrderStatus.PAID,
+        "created_at": datetime.utcnow()
+    }
+    
+    await submit_flash_sale_order(order_dict, item)
+    
+    return respond(order_to_response(order_dict, [item]))
+
+def build_order_filter(
+    order_status: Optional[OrderStatus],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime]
+) -> dict:
+    """构造订单列表的过滤条件"""
+    query = {}
+    if order_status is not None:
+        query["status"] = order_status.value
+    if created_from is not None or created_to is not None:
+        query["created_at"] = {}
+        if created_from is not None:
+            query["created_at"]["$gte"] = created_from
+        if created_to is not None:
+            query["created_at"]["$lt"] = created_to
+    return query
+
+async def list_orders(
+    query: dict,
+    response: Response,
+    fields: Optional[str],
+    limit: int,
+    cursor: Optional[str],
+    all_orders: bool
+):
+    """按创建时间倒序返回订单列表（游标分页，all_orders 为真时返回全部，包括已归档的订单），用户与管理员订单列表共用"""
+    selected_fields = parse_fields(fields, OrderListResponse)
+    projection = build_projection(
+        selected_fields or list(OrderListResponse.model_fields),
+        {"id": "_id", "item_count": None},
+        extra=[field for field, _ in ORDER_SORT]
+    )
+    # 订单项数量取自订单上的冗余字段，不再逐个订单统计
+    with_count = not selected_fields or "item_count" in selected_fields
+    if with_count:
+        projection = with_item_count(projection)
+    
+    if all_orders:
+        orders = await find_orders(query, projection, ORDER_SORT)
+    else:
+        query = apply_cursor(query, ORDER_SORT, cursor)
+        orders = await find_orders(query, projection, ORDER_SORT, limit)
+        # 返回满页时提供下一页游标
+        if len(orders) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(orders[-1], ORDER_SORT)
+    if with_count:
+        await fill_item_counts(orders)
     
-    return order_list
+    if selected_fields:
+        rows = [{**order, "id": str(order["_id"])} for order in orders]
+        return sparse_response(OrderListResponse, selected_fields, rows, response)
+    
+    return respond([order_to_list_response(order, order["item_count"]) for order in orders], response)
+
+@router.get("/", response_model=List[OrderListResponse], summary="获取订单列表")
+async def get_orders(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="返回的订单数量"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    order_status: Optional[OrderStatus] = Query(None, alias="status", description="按订单状态过滤"),
+    created_from: Optional[datetime] = Query(None, description="创建时间下限（包含）"),
+    created_to: Optional[datetime] = Query(None, description="创建时间上限（不包含）"),
+    all_orders: bool = Query(False, alias="all", description="不分页，返回全部订单"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 id,order_number,status"),
+    current_user = Depends(get_current_principal)
+):
+    """获取当前用户的订单列表（包括已归档的订单），支持状态与时间过滤、游标分页和字段裁剪"""
+    query = build_order_filter(order_status, created_from, created_to)
+    query["user_id"] = str(current_user["_id"])
+    
+    return await list_orders(query, response, fields, limit, cursor, all_orders)
 
 @router.get("/{order_id}", response_model=OrderResponse, summary="获取订单详情")
-async def get_order(order_id: str, current_user = Depends(get_current_user_obj)):
+async def get_order(
+    order_id: str,
+    request: Request,
+    response: Response,
+    current_user = Depends(get_current_principal)
+):
     """获取订单详细信息"""
     if not ObjectId.is_valid(order_id):
         raise HTTPException(
@@ -129,13 +339,10 @@ async def get_order(order_id: str, current_user = Depends(get_current_user_obj))
             detail="无效的订单ID"
         )
     
-    orders_collection = get_orders_collection()
-    order_items_collection = get_order_items_collection()
-    
     user_id = str(current_user["_id"])
     
-    # 查找订单
-    order = await orders_collection.find_one({
+    # 查找订单（包括已归档的订单）
+    order = await find_order({
         "_id": ObjectId(order_id),
         "user_id": user_id
     })
@@ -146,25 +353,12 @@ async def get_order(order_id: str, current_user = Depends(get_current_user_obj))
             detail="订单不存在"
         )
     
+    # 客户端缓存仍有效时无需读取订单项
+    not_modified = conditional_response(request, response, make_etag(order_version(order)), PRIVATE_REVALIDATE)
+    if not_modified:
+        return not_modified
+    
     # 获取订单项
-    order_items = await order_items_collection.find({"order_id": order_id}).to_list(length=None)
-    
-    items = [
-        OrderItemBase(
-            product_id=item["product_id"],
-            product_name=item["product_name"],
-            product_price=item["product_price"],
-            quantity=item["quantity"],
-            subtotal=item["subtotal"]
-        )
-        for item in order_items
-    ]
-    
-    return OrderResponse(
-        id=str(order["_id"]),
-        order_number=order["order_number"],
-        total_amount=order["total_amount"],
-        status=order["status"],
-        created_at=order["created_at"],
-        items=items
-    ) 
\ No newline at end of file
+    order_items = await load_order_items(order)
+    
+    return respond(order_to_response(order, order_items), response) 
\ No newline at end of file
@@ -1,40 +1,380 @@
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import AsyncIterator, List, Literal, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 from datetime import datetime
-from app.models.product import Product, ProductCreate, ProductUpdate, ProductResponse
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+import csv
+import io
+import json
+from app.models.product import Product, ProductCreate, ProductUpdate, ProductResponse, ProductImportError, ProductImportResult, ProductBatchRequest, ProductBatchItem, product_to_response
+from app.core.config import settings
 from app.core.database import get_products_collection
-from app.api.auth import get_current_user_obj
+from app.core.fields import parse_fields, build_projection, sparse_response
+from app.core.http_cache import make_etag, conditional_response
+from app.core.product_cache import get_product_by_id, get_products_by_ids, cache_product, invalidate_product
+from app.core.search import product_search_index
+from app.core.responses import respond
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_cursor, encode_cursor
+from app.api.auth import get_current_principal
 
 router = APIRouter()
 
+# 商品列表支持的排序（“-”前缀表示降序），_id 保证顺序稳定，索引见 app/core/indexes.py
+PRODUCT_SORTS = {
+    "-created_at": [("created_at", -1), ("_id", -1)],
+    "created_at": [("created_at", 1), ("_id", 1)],
+    "price": [("price", 1), ("_id", 1)],
+    "-price": [("price", -1), ("_id", -1)],
+    "name": [("name", 1), ("_id", 1)],
+    "-name": [("name", -1), ("_id", -1)],
+}
+ProductSort = Literal["-created_at", "created_at", "price", "-price", "name", "-name"]
+
+# 计算分页游标和 ETag 所需的文档字段，精简查询时也总是读取
+PRODUCT_VERSION_FIELDS = ["created_at", "updated_at", "stock"]
+
+def product_version(product: dict) -> str:
+    """商品内容版本（下单扣减库存不更新 updated_at，因此库存单独计入）"""
+    changed_at = product.get("updated_at") or product["created_at"]
+    return f"{product['_id']}:{changed_at.isoformat()}:{product['stock']}"
+
+def build_product_filter(
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    in_stock: Optional[bool] = None
+) -> dict:
+    """构造商品列表的过滤条件"""
+    query = {}
+    
+    price_range = {}
+    if price_min is not None:
+        price_range["$gte"] = price_min
+    if price_max is not None:
+        price_range["$lte"] = price_max
+    if price_range:
+        query["price"] = price_range
+    
+    if in_stock is True:
+        query["stock"] = {"$gt": 0}
+    elif in_stock is False:
+        query["stock"] = {"$lte": 0}
+    
+    return query
+
+def catalog_cache_control() -> str:
+    """商品目录接口的 Cache-Control"""
+    return f"public, max-age={settings.CATALOG_CACHE_MAX_AGE}, must-revalidate"
+
 @router.get("/", response_model=List[ProductResponse], summary="获取商品列表")
 async def get_products(
-    skip: int = Query(0, ge=0, description="跳过的商品数量"),
-    limit: int = Query(10, ge=1, le=100, description="返回的商品数量")
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="跳过的商品数量（兼容旧版分页，传入 cursor 时忽略）"),
+    limit: int = Query(10, ge=1, le=100, description="返回的商品数量"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 id,name,price,image_url"),
+    price_min: Optional[float] = Query(None, ge=0, description="最低价格"),
+    price_max: Optional[float] = Query(None, ge=0, description="最高价格"),
+    in_stock: Optional[bool] = Query(None, description="true 只返回有货商品，false 只返回缺货商品"),
+    sort: ProductSort = Query("-created_at", description="排序字段：created_at、price、name，加“-”前缀表示降序")
 ):
-    """获取商品列表，支持分页"""
+    """获取商品列表，支持过滤、排序、偏移分页、游标分页和字段裁剪"""
     products_collection = get_products_collection()
     
-    cursor = products_collection.find().skip(skip).limit(limit)
-    products = await cursor.to_list(length=limit)
+    sort_spec = PRODUCT_SORTS[sort]
     
-    return [
-        ProductResponse(
-            id=str(product["_id"]),
-            name=product["name"],
-            description=product["description"],
-            price=product["price"],
-            stock=product["stock"],
-            image_url=product["image_url"],
-            created_at=product["created_at"],
-            updated_at=product.get("updated_at")
+    selected_fields = parse_fields(fields, ProductResponse)
+    projection = None
+    if selected_fields:
+        extra_fields = PRODUCT_VERSION_FIELDS + [field for field, _ in sort_spec]
+        projection = build_projection(selected_fields, {"id": "_id"}, extra=extra_fields)
+    
+    query = build_product_filter(price_min, price_max, in_stock)
+    query = apply_cursor(query, sort_spec, cursor)
+    find_cursor = products_collection.find(query, projection).sort(sort_spec)
+    if skip and not cursor:
+        find_cursor = find_cursor.skip(skip)
+    products = await find_cursor.limit(limit).to_list(length=limit)
+    
+    # 返回满页时提供下一页游标
+    if len(products) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(products[-1], sort_spec)
+    
+    etag = make_etag(fields or "", *(product_version(product) for product in products))
+    not_modified = conditional_response(request, response, etag, catalog_cache_control())
+    if not_modified:
+        return not_modified
+    
+    if selected_fields:
+        rows = [{**product, "id": str(product["_id"])} for product in products]
+        return sparse_response(ProductResponse, selected_fields, rows, response)
+    
+    return respond([product_to_response(product) for product in products], response)
+
+@router.get("/search", response_model=List[ProductResponse], summary="搜索商品")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="搜索关键词，匹配商品名称和描述"),
+    limit: int = Query(20, ge=1, le=100, description="返回的商品数量")
+):
+    """按相关度搜索商品，支持中文"""
+    # 启动时检索索引在后台构建，构建完成前的结果不完整
+    if not product_search_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="搜索索引构建中，请稍后重试",
+            headers={"Retry-After": "5"}
         )
-        for product in products
+    
+    product_ids = product_search_index.search(q, limit)
+    if not product_ids:
+        return []
+    
+    products_by_id = await get_products_by_ids(product_ids)
+    
+    return respond([
+        product_to_response(products_by_id[product_id])
+        for product_id in product_ids
+        if product_id in products_by_id
+    ])
+
+async def _batch_lookup(product_ids: List[str]) -> list:
+    """按请求顺序批量查询商品，不存在或无效的ID标记为未找到"""
+    if len(product_ids) > settings.PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多查询 {settings.PRODUCT_BATCH_MAX_IDS} 个商品"
+        )
+    
+    valid_ids = [product_id for product_id in product_ids if ObjectId.is_valid(product_id)]
+    products = await get_products_by_ids(valid_ids)
+    
+    return [
+        {
+            "id": product_id,
+            "found": product_id in products,
+            "product": product_to_response(products[product_id]) if product_id in products else None
+        }
+        for product_id in product_ids
     ]
 
+@router.get("/batch", response_model=List[ProductBatchItem], summary="批量获取商品")
+async def get_products_batch(
+    ids: str = Query(..., min_length=1, description="商品ID列表，逗号分隔")
+):
+    """一次查询多个商品，结果与请求顺序一致"""
+    product_ids = [product_id.strip() for product_id in ids.split(",") if product_id.strip()]
+    return respond(await _batch_lookup(product_ids))
+
+@router.post("/batch", response_model=List[ProductBatchItem], summary="批量获取商品")
+async def post_products_batch(batch: ProductBatchRequest):
+    """一次查询多个商品（ID较多时使用），结果与请求顺序一致"""
+    return respond(await _batch_lookup(batch.ids))
+
+# 批量导入导出的字段顺序（CSV 表头）
+PRODUCT_EXPORT_FIELDS = ["id", "name", "description", "price", "stock", "image_url", "created_at", "updated_at"]
+
+async def _iter_request_lines(request: Request) -> AsyncIterator[bytes]:
+    """逐行读取请求体，不把整个上传内容载入内存"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+def _format_validation_error(error: ValidationError) -> str:
+    """将校验错误整理为一行说明"""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+def _build_import_operation(row: dict, now: datetime):
+    """校验一行导入数据并生成写操作：带 id 的行按 id 更新或插入，否则直接插入
+    
+    返回 (写操作, 商品ID, 商品字段)。
+    """
+    product_id = row.pop("id", None) or None
+    if product_id is not None and not ObjectId.is_valid(product_id):
+        raise ValueError("id: 无效的商品ID")
+    
+    product_dict = ProductCreate(**row).dict()
+    if product_id is None:
+        product_dict["_id"] = ObjectId()
+        product_dict["created_at"] = now
+        return InsertOne(product_dict), str(product_dict["_id"]), product_dict
+    
+    product_dict["updated_at"] = now
+    operation = UpdateOne(
+        {"_id": ObjectId(product_id)},
+        {"$set": product_dict, "$setOnInsert": {"created_at": now}},
+        upsert=True
+    )
+    return operation, product_id, product_dict
+
+@router.post("/import", response_model=ProductImportResult, summary="批量导入商品")
+async def import_products(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="上传数据格式"),
+    current_user = Depends(get_current_principal)
+):
+    """流式批量导入商品（需要管理员权限）
+    
+    - 请求体为 NDJSON（每行一个 JSON 对象）或带表头的 CSV
+    - 每行按 ProductCreate 校验，带 id 的行按 id 更新（不存在则插入）
+    - 数据分批写入，返回逐行错误
+    """
+    if not current_user.get("is_admin", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    
+    products_collection = get_products_collection()
+    
+    inserted = 0
+    updated = 0
+    error_count = 0
+    errors: List[ProductImportError] = []
+    operations = []
+    operation_rows = []
+    csv_header: Optional[List[str]] = None
+    
+    def record_error(line_number: int, message: str):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < settings.PRODUCT_IMPORT_MAX_ERRORS:
+            errors.append(ProductImportError(line=line_number, error=message))
+    
+    async def flush():
+        nonlocal inserted, updated
+        if not operations:
+            return
+        
+        failed_indexes = set()
+        try:
+            result = await products_collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                failed_indexes.add(write_error["index"])
+                record_error(operation_rows[write_error["index"]][0], write_error.get("errmsg", "写入失败"))
+        
+        inserted += details.get("nInserted", 0) + details.get("nUpserted", 0)
+        updated += details.get("nModified", 0)
+        
+        # 同步商品缓存与检索索引
+        for index, (_, product_id, product_dict) in enumerate(operation_rows):
+            if index in failed_indexes:
+                continue
+            invalidate_product(product_id)
+            product_search_index.add(product_id, product_dict["name"], product_dict["description"])
+        
+        operations.clear()
+        operation_rows.clear()
+    
+    line_number = 0
+    async for raw_line in _iter_request_lines(request):
+        line_number += 1
+        
+        try:
+            line = raw_line.decode("utf-8-sig").rstrip("\r")
+            if not line.strip():
+                continue
+            
+            if format == "csv":
+                values = next(csv.reader([line]))
+                if csv_header is None:
+                    csv_header = [value.strip() for value in values]
+                    continue
+                if len(values) != len(csv_header):
+                    raise ValueError(f"列数不匹配：期望 {len(csv_header)} 列，实际 {len(values)} 列")
+                row = {key: value for key, value in zip(csv_header, values) if value != ""}
+            else:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("每行必须是一个 JSON 对象")
+            
+            operation, product_id, product_dict = _build_import_operation(row, datetime.utcnow())
+            operations.append(operation)
+            operation_rows.append((line_number, product_id, product_dict))
+        except ValidationError as e:
+            record_error(line_number, _format_validation_error(e))
+        except ValueError as e:
+            # json.JSONDecodeError 与 UnicodeDecodeError 均为 ValueError
+            record_error(line_number, str(e))
+        
+        if len(operations) >= settings.PRODUCT_IMPORT_BATCH_SIZE:
+            await flush()
+    
+    await flush()
+    
+    return ProductImportResult(
+        inserted=inserted,
+        updated=updated,
+        error_count=error_count,
+        errors=errors
+    )
+
+@router.get("/export", summary="批量导出商品")
+async def export_products(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="导出数据格式"),
+    current_user = Depends(get_current_principal)
+):
+    """流式导出全部商品（需要管理员权限），导出文件可直接用于批量导入"""
+    if not current_user.get("is_admin", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    
+    products_collection = get_products_collection()
+    
+    def to_row(product: dict) -> dict:
+        updated_at = product.get("updated_at")
+        return {
+            "id": str(product["_id"]),
+            "name": product["name"],
+            "description": product["description"],
+            "price": product["price"],
+            "stock": product["stock"],
+            "image_url": product["image_url"],
+            "created_at": product["created_at"].isoformat(),
+            "updated_at": updated_at.isoformat() if updated_at else None
+        }
+    
+    def to_csv_line(values: list) -> str:
+        output = io.StringIO()
+        csv.writer(output).writerow(values)
+        return output.getvalue()
+    
+    async def generate():
+        if format == "csv":
+            yield to_csv_line(PRODUCT_EXPORT_FIELDS)
+        
+        cursor = products_collection.find().sort("_id", 1).batch_size(settings.PRODUCT_IMPORT_BATCH_SIZE)
+        async for product in cursor:
+            row = to_row(product)
+            if format == "csv":
+                yield to_csv_line(["" if row[field] is None else row[field] for field in PRODUCT_EXPORT_FIELDS])
+            else:
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+    )
+
 @router.get("/{product_id}", response_model=ProductResponse, summary="获取商品详情")
-async def get_product(product_id: str):
+async def get_product(product_id: str, request: Request, response: Response):
     """根据ID获取商品详细信息"""
     if not ObjectId.is_valid(product_id):
         raise HTTPException(
@@ -42,8 +382,7 @@ async def get_product(product_id: str):
             detail="无效的商品ID"
         )
     
-    products_collection = get_products_collection()
-    product = await products_collection.find_one({"_id": ObjectId(product_id)})
+    product = await get_product_by_id(product_id)
     
     if not product:
         raise HTTPException(
@@ -51,21 +390,16 @@ async def get_product(product_id: str):
             detail="商品不存在"
         )
     
-    return ProductResponse(
-        id=str(product["_id"]),
-        name=product["name"],
-        description=product["description"],
-        price=product["price"],
-        stock=product["stock"],
-        image_url=product["image_url"],
-        created_at=product["created_at"],
-        updated_at=product.get("updated_at")
-    )
+    not_modified = conditional_response(request, response, make_etag(product_version(product)), catalog_cache_control())
+    if not_modified:
+        return not_modified
+    
+    return respond(product_to_response(product), response)
 
 @router.post("/", response_model=ProductResponse, summary="创建商品")
 async def create_product(
     product: ProductCreate,
-    current_user = Depends(get_current_user_obj)
+    current_user = Depends(get_current_principal)
 ):
     """创建新商品（需要管理员权限）"""
     if not current_user.get("is_admin", False):
@@ -79,25 +413,18 @@ async def create_product(
     product_dict = product.dict()
     product_dict["created_at"] = datetime.utcnow()
     
-    result = await products_collection.insert_one(product_dict)
-    created_product = await products_collection.find_one({"_id": result.inserted_id})
-    
-    return ProductResponse(
-        id=str(created_product["_id"]),
-        name=created_product["name"],
-        description=created_product["description"],
-        price=created_product["price"],
-        stock=created_product["stock"],
-        image_url=created_product["image_url"],
-        created_at=created_product["created_at"],
-        updated_at=created_product.get("updated_at")
-    )
+    # insert_one 会把生成的 _id 写回 product_dict，无需再查询一次
+    await products_collection.insert_one(product_dict)
+    cache_product(product_dict)
+    product_search_index.add(str(product_dict["_id"]), product_dict["name"], product_dict["description"])
+    
+    return respond(product_to_response(product_dict))
 
 @router.put("/{product_id}", response_model=ProductResponse, summary="更新商品")
 async def update_product(
     product_id: str,
     product_update: ProductUpdate,
-    current_user = Depends(get_current_user_obj)
+    current_user = Depends(get_current_principal)
 ):
     """更新商品信息（需要管理员权限）"""
     if not current_user.get("is_admin", False):
@@ -114,41 +441,33 @@ async def update_product(
     
     products_collection = get_products_collection()
     
-    # 检查商品是否存在
-    existing_product = await products_collection.find_one({"_id": ObjectId(product_id)})
-    if not existing_product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="商品不存在"
-        )
-    
-    # 更新商品
+    # 更新商品并直接返回更新后的文档
     update_data = {k: v for k, v in product_update.dict().items() if v is not None}
     if update_data:
         update_data["updated_at"] = datetime.utcnow()
-        await products_collection.update_one(
+        updated_product = await products_collection.find_one_and_update(
             {"_id": ObjectId(product_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
+    else:
+        updated_product = await get_product_by_id(product_id, fresh=True)
     
-    # 返回更新后的商品
-    updated_product = await products_collection.find_one({"_id": ObjectId(product_id)})
-    
-    return ProductResponse(
-        id=str(updated_product["_id"]),
-        name=updated_product["name"],
-        description=updated_product["description"],
-        price=updated_product["price"],
-        stock=updated_product["stock"],
-        image_url=updated_product["image_url"],
-        created_at=updated_product["created_at"],
-        updated_at=updated_product.get("updated_at")
-    )
+    if not updated_product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="商品不存在"
+        )
+    
+    cache_product(updated_product)
+    product_search_index.add(product_id, updated_product["name"], updated_product["description"])
+    
+    return respond(product_to_response(updated_product))
 
 @router.delete("/{product_id}", summary="删除商品")
 async def delete_product(
     product_id: str,
-    current_user = Depends(get_current_user_obj)
+    current_user = Depends(get_current_principal)
 ):
     """删除商品（需要管理员权限）"""
     if not current_user.get("is_admin", False):
@@ -165,15 +484,15 @@ async def delete_product(
     
     products_collection = get_products_collection()
     
-    # 检查商品是否存在
-    existing_product = await products_collection.find_one({"_id": ObjectId(product_id)})
-    if not existing_product:
+    # 删除商品
+    result = await products_collection.delete_one({"_id": ObjectId(product_id)})
+    invalidate_product(product_id)
+    if result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="商品不存在"
         )
     
-    # 删除商品
-    await products_collection.delete_one({"_id": ObjectId(product_id)})
+    product_search_index.remove(product_id)
     
     return {"message": "商品删除成功"} 
\ No newline at end of file
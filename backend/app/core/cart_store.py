@@ -0,0 +1,298 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.database import get_cart_collection, get_carts_collection
+
+class CartStore(ABC):
+    """购物车存储接口
+
+    两种存储模式返回的购物车项结构一致：{_id, product_id, quantity, created_at, updated_at}。
+    同一用户重复加入同一商品时 insert_item 抛出 DuplicateKeyError。
+    """
+
+    @abstractmethod
+    async def list_items(self, user_id: str) -> List[dict]:
+        """获取用户购物车中的全部商品项"""
+
+    @abstractmethod
+    async def find_item_by_product(self, user_id: str, product_id: str) -> Optional[dict]:
+        """按商品ID查找"""
+
+    @abstractmethod
+    async def insert_item(self, user_id: str, product_id: str, quantity: int) -> dict:
+        """新增购物车项并返回"""
+
+    @abstractmethod
+    async def add_quantity(self, user_id: str, product_id: str, quantity: int, stock: int) -> Optional[dict]:
+        """累加商品数量（不存在时新增），累加后的数量不超过 stock，超出时返回 None"""
+
+    @abstractmethod
+    async def set_item_quantity(
+        self, user_id: str, item_id: str, quantity: int, expected_quantity: Optional[int] = None
+    ) -> Optional[dict]:
+        """修改数量并返回修改前的购物车项，不存在时返回 None；
+        传入 expected_quantity 时只在当前数量等于该值时修改（不满足时同样返回 None）"""
+
+    @abstractmethod
+    async def remove_item(self, user_id: str, item_id: str) -> bool:
+        """删除购物车项，返回是否删除成功"""
+
+    @abstractmethod
+    async def apply_quantities(self, user_id: str, quantities: Dict[str, Optional[int]]) -> None:
+        """按商品ID批量设置数量（None 表示移除），一次 bulk_write 完成"""
+
+    @abstractmethod
+    async def remove_products(self, user_id: str, product_ids: List[str], updated_before: datetime, session=None) -> int:
+        """移除指定商品中 updated_before 之后没有修改过的购物车项，返回移除的数量"""
+
+    @abstractmethod
+    async def clear(self, user_id: str) -> None:
+        """清空购物车"""
+
+class LineCartStore(CartStore):
+    """每个购物车项一个文档（cart 集合，按 user_id + product_id 唯一）"""
+
+    async def list_items(self, user_id: str) -> List[dict]:
+        return await get_cart_collection().find({"user_id": user_id}).to_list(length=None)
+
+    async def find_item_by_product(self, user_id: str, product_id: str) -> Optional[dict]:
+        return await get_cart_collection().find_one({"user_id": user_id, "product_id": product_id})
+
+    async def insert_item(self, user_id: str, product_id: str, quantity: int) -> dict:
+        now = datetime.utcnow()
+        item = {
+            "product_id": product_id,
+            "quantity": quantity,
+            "user_id": user_id,
+            "created_at": now,
+            "updated_at": now
+        }
+        await get_cart_collection().insert_one(item)
+        return item
+
+    async def add_quantity(self, user_id: str, product_id: str, quantity: int, stock: int) -> Optional[dict]:
+        if quantity > stock:
+            return None
+
+        now = datetime.utcnow()
+        query = {"user_id": user_id, "product_id": product_id, "quantity": {"$lte": stock - quantity}}
+        update = {
+            "$inc": {"quantity": quantity},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"created_at": now}
+        }
+        # 库存上限作为过滤条件：已有购物车项超出上限时过滤不匹配，upsert 因唯一索引冲突失败
+        try:
+            return await get_cart_collection().find_one_and_update(
+                query, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            pass
+
+        # 冲突也可能来自并发的首次加入，此时购物车项已存在，再尝试一次不带 upsert 的条件累加
+        return await get_cart_collection().find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER
+        )
+
+    async def set_item_quantity(
+        self, user_id: str, item_id: str, quantity: int, expected_quantity: Optional[int] = None
+    ) -> Optional[dict]:
+        query = {"_id": ObjectId(item_id), "user_id": user_id}
+        if expected_quantity is not None:
+            query["quantity"] = expected_quantity
+        return await get_cart_collection().find_one_and_update(
+            query,
+            {"$set": {"quantity": quantity, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.BEFORE
+        )
+
+    async def remove_item(self, user_id: str, item_id: str) -> bool:
+        result = await get_cart_collection().delete_one({"_id": ObjectId(item_id), "user_id": user_id})
+        return result.deleted_count > 0
+
+    async def apply_quantities(self, user_id: str, quantities: Dict[str, Optional[int]]) -> None:
+        now = datetime.utcnow()
+        operations = []
+        for product_id, quantity in quantities.items():
+            line = {"user_id": user_id, "product_id": product_id}
+            if quantity is None:
+                operations.append(DeleteOne(line))
+            else:
+                operations.append(UpdateOne(
+                    line,
+                    {"$set": {"quantity": quantity, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                    upsert=True
+                ))
+        if operations:
+            await get_cart_collection().bulk_write(operations)
+
+    async def remove_products(self, user_id: str, product_ids: List[str], updated_before: datetime, session=None) -> int:
+        result = await get_cart_collection().delete_many({
+            "user_id": user_id,
+            "product_id": {"$in": product_ids},
+            "updated_at": {"$lte": updated_before}
+        }, session=session)
+        return result.deleted_count
+
+    async def clear(self, user_id: str) -> None:
+        await get_cart_collection().delete_many({"user_id": user_id})
+
+class DocumentCartStore(CartStore):
+    """每个用户一个购物车文档（carts 集合，按 user_id 唯一），商品项内嵌在 items 数组中
+
+    单文档读取整个购物车，所有修改都是对该文档的原子更新。
+    """
+
+    @staticmethod
+    def _first_item(cart: Optional[dict]) -> Optional[dict]:
+        """取出投影后只剩一个元素的 items 数组中的商品项"""
+        if not cart or not cart.get("items"):
+            return None
+        return cart["items"][0]
+
+    async def list_items(self, user_id: str) -> List[dict]:
+        cart = await get_carts_collection().find_one({"user_id": user_id}, {"items": 1})
+        return cart["items"] if cart else []
+
+    async def find_item_by_product(self, user_id: str, product_id: str) -> Optional[dict]:
+        cart = await get_carts_collection().find_one(
+            {"user_id": user_id, "items.product_id": product_id},
+            {"items.$": 1}
+        )
+        return self._first_item(cart)
+
+    async def insert_item(self, user_id: str, product_id: str, quantity: int) -> dict:
+        now = datetime.utcnow()
+        item = {
+            "_id": ObjectId(),
+            "product_id": product_id,
+            "quantity": quantity,
+            "created_at": now,
+            "updated_at": now
+        }
+        # 商品已在购物车中时过滤条件不匹配，upsert 会因 user_id 唯一索引抛出 DuplicateKeyError
+        await get_carts_collection().update_one(
+            {"user_id": user_id, "items.product_id": {"$ne": product_id}},
+            {"$push": {"items": item}, "$set": {"updated_at": now}},
+            upsert=True
+        )
+        return item
+
+    async def _increment_item(self, user_id: str, product_id: str, quantity: int, stock: int) -> Optional[dict]:
+        """对已有购物车项做带库存上限的条件累加"""
+        now = datetime.utcnow()
+        cart = await get_carts_collection().find_one_and_update(
+            {
+                "user_id": user_id,
+                "items": {"$elemMatch": {"product_id": product_id, "quantity": {"$lte": stock - quantity}}}
+            },
+            {"$inc": {"items.$.quantity": quantity}, "$set": {"items.$.updated_at": now, "updated_at": now}},
+            projection={"items": {"$elemMatch": {"product_id": product_id}}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._first_item(cart)
+
+    async def add_quantity(self, user_id: str, product_id: str, quantity: int, stock: int) -> Optional[dict]:
+        if quantity > stock:
+            return None
+
+        item = await self._increment_item(user_id, product_id, quantity, stock)
+        if item:
+            return item
+
+        # 不存在时新增；冲突说明商品已在购物车中（超出库存或并发加入），再尝试一次条件累加
+        try:
+            return await self.insert_item(user_id, product_id, quantity)
+        except DuplicateKeyError:
+            return await self._increment_item(user_id, product_id, quantity, stock)
+
+    async def set_item_quantity(
+        self, user_id: str, item_id: str, quantity: int, expected_quantity: Optional[int] = None
+    ) -> Optional[dict]:
+        now = datetime.utcnow()
+        match = {"_id": ObjectId(item_id)}
+        if expected_quantity is not None:
+            match["quantity"] = expected_quantity
+        cart = await get_carts_collection().find_one_and_update(
+            {"user_id": user_id, "items": {"$elemMatch": match}},
+            {"$set": {"items.$.quantity": quantity, "items.$.updated_at": now, "updated_at": now}},
+            projection={"items": {"$elemMatch": {"_id": ObjectId(item_id)}}},
+            return_document=ReturnDocument.BEFORE
+        )
+        return self._first_item(cart)
+
+    async def remove_item(self, user_id: str, item_id: str) -> bool:
+        result = await get_carts_collection().update_one(
+            {"user_id": user_id, "items._id": ObjectId(item_id)},
+            {"$pull": {"items": {"_id": ObjectId(item_id)}}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+    async def apply_quantities(self, user_id: str, quantities: Dict[str, Optional[int]]) -> None:
+        if not quantities:
+            return
+
+        now = datetime.utcnow()
+        # 先确保购物车文档存在，之后的新增用 $ne 条件 $push，已存在的商品项不会重复加入
+        operations = [UpdateOne(
+            {"user_id": user_id},
+            {"$set": {"updated_at": now}, "$setOnInsert": {"items": []}},
+            upsert=True
+        )]
+        for product_id, quantity in quantities.items():
+            if quantity is None:
+                operations.append(UpdateOne(
+                    {"user_id": user_id},
+                    {"$pull": {"items": {"product_id": product_id}}}
+                ))
+                continue
+
+            operations.append(UpdateOne(
+                {"user_id": user_id, "items.product_id": product_id},
+                {"$set": {"items.$.quantity": quantity, "items.$.updated_at": now}}
+            ))
+            operations.append(UpdateOne(
+                {"user_id": user_id, "items.product_id": {"$ne": product_id}},
+                {"$push": {"items": {
+                    "_id": ObjectId(),
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "created_at": now,
+                    "updated_at": now
+                }}}
+            ))
+        await get_carts_collection().bulk_write(operations)
+
+    async def remove_products(self, user_id: str, product_ids: List[str], updated_before: datetime, session=None) -> int:
+        # 返回修改前的购物车文档，据此计算移除的商品项数（单文档更新是原子的）
+        condition = {"product_id": {"$in": product_ids}, "updated_at": {"$lte": updated_before}}
+        cart = await get_carts_collection().find_one_and_update(
+            {"user_id": user_id},
+            {"$pull": {"items": condition}, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"items.product_id": 1, "items.updated_at": 1},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if not cart:
+            return 0
+        wanted = set(product_ids)
+        return sum(
+            1 for item in cart.get("items", [])
+            if item["product_id"] in wanted and item["updated_at"] <= updated_before
+        )
+
+    async def clear(self, user_id: str) -> None:
+        await get_carts_collection().delete_one({"user_id": user_id})
+
+_stores: Dict[str, CartStore] = {
+    "lines": LineCartStore(),
+    "document": DocumentCartStore()
+}
+
+def get_cart_store() -> CartStore:
+    """按 CART_STORAGE_MODE 返回当前使用的购物车存储"""
+    return _stores[settings.CART_STORAGE_MODE]
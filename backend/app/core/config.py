@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Literal
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -24,6 +24,75 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
     
+    # 无状态认证模式：令牌携带用户ID/管理员标识/令牌版本，受保护接口不再查询用户
+    AUTH_STATELESS: bool = False
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = 30
+    
+    # 密码哈希配置（并发线程数与最大排队数，超出时返回 503）
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    
+    # 用户缓存配置（多进程部署时各进程独立缓存，TTL 决定跨进程的最大延迟）
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+    
+    # 商品缓存配置（多进程部署时其他进程的写入最迟在 TTL 后可见）
+    PRODUCT_CACHE_MAX_SIZE: int = 50000
+    PRODUCT_CACHE_TTL_SECONDS: int = 30
+    
+    # 商品目录接口的浏览器缓存秒数（过期后通过 ETag 重新验证）
+    CATALOG_CACHE_MAX_AGE: int = 10
+    
+    # 批量查询商品时单次最多的商品ID数量
+    PRODUCT_BATCH_MAX_IDS: int = 300
+    
+    # 商品批量导入导出配置（每批写入行数与最多返回的错误行数）
+    PRODUCT_IMPORT_BATCH_SIZE: int = 1000
+    PRODUCT_IMPORT_MAX_ERRORS: int = 1000
+    
+    # 快速序列化：接口直接以 orjson 输出数据库中的可信数据，跳过 response_model 的二次校验
+    FAST_JSON_RESPONSES: bool = False
+    
+    # 下单时在 MongoDB 事务中扣减库存并写入订单（需要副本集或分片集群），关闭时失败由补偿逻辑归还库存
+    ORDER_TRANSACTIONS: bool = False
+    
+    # 库存预留标记超过多少秒仍未移除视为进程已中断，由清理任务归还库存（订单未写入时）并移除标记
+    STOCK_HOLD_TIMEOUT_SECONDS: int = 600
+    
+    # 下单幂等键：结果保留时长，以及进行中的请求超过多少秒未完成视为已中断（可被相同键的请求接管）
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_LOCK_SECONDS: int = 30
+    
+    # 订单存储模式：separate 订单项单独存放在 order_items 集合，embedded 订单项内嵌在订单文档中
+    # 两种模式写入的订单都可以读取，切换后可用 scripts/migrate_order_items.py 迁移旧订单
+    ORDER_STORAGE_MODE: Literal["separate", "embedded"] = "separate"
+    
+    # 购物车批量修改时单次最多的操作数量
+    CART_BULK_MAX_OPERATIONS: int = 100
+    
+    # 购物车存储模式：lines 每个购物车项一个文档（cart 集合），document 每个用户一个文档（carts 集合）
+    # 切换前先用 scripts/migrate_cart_storage.py 迁移已有数据
+    CART_STORAGE_MODE: Literal["lines", "document"] = "lines"
+    
+    # 秒杀模式：逗号分隔的商品ID，这些商品的库存在进程内计数，订单经有界队列批量落库
+    FLASH_SALE_PRODUCT_IDS_STR: str = Field(default="", alias="FLASH_SALE_PRODUCT_IDS")
+    FLASH_SALE_QUEUE_SIZE: int = 10000
+    FLASH_SALE_BATCH_SIZE: int = 200
+    FLASH_SALE_MAX_QUANTITY: int = 5
+    
+    # 下单后续处理（outbox 事件）：处理任务数、空闲轮询间隔（秒）、单次处理租约（秒，超时未完成的事件重新投递）、
+    # 最大尝试次数，以及已完成事件的保留时长
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_POLL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETENTION_HOURS: int = 24
+    
+    # 订单归档：创建超过多少天的订单移入 orders_archive 集合（默认 0，不归档）、归档任务执行间隔（小时）与每批订单数
+    ORDER_ARCHIVE_AFTER_DAYS: int = 0
+    ORDER_ARCHIVE_INTERVAL_HOURS: float = 24
+    ORDER_ARCHIVE_BATCH_SIZE: int = 500
+    
     # CORS 配置 - 使用字符串，稍后处理为列表
     ALLOWED_HOSTS_STR: str = Field(default="http://localhost:3000,http://127.0.0.1:3000", alias="ALLOWED_HOSTS")
     
@@ -31,5 +100,10 @@ class Settings(BaseSettings):
     def ALLOWED_HOSTS(self) -> List[str]:
         """将逗号分隔的字符串转换为列表"""
         return [host.strip() for host in self.ALLOWED_HOSTS_STR.split(',') if host.strip()]
+    
+    @property
+    def FLASH_SALE_PRODUCT_IDS(self) -> List[str]:
+        """将逗号分隔的秒杀商品ID转换为列表"""
+        return [product_id.strip() for product_id in self.FLASH_SALE_PRODUCT_IDS_STR.split(',') if product_id.strip()]
 
 settings = Settings() 
\ No newline at end of file
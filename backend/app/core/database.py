@@ -32,8 +32,26 @@ def get_products_collection():
 def get_cart_collection():
     return database.database.cart
 
+def get_carts_collection():
+    return database.database.carts
+
 def get_orders_collection():
     return database.database.orders
 
 def get_order_items_collection():
-    return database.database.order_items 
\ No newline at end of file
+    return database.database.order_items
+
+def get_orders_archive_collection():
+    return database.database.orders_archive
+
+def get_order_archive_summary_collection():
+    return database.database.order_archive_summary
+
+def get_archived_product_sales_collection():
+    return database.database.archived_product_sales
+
+def get_idempotency_keys_collection():
+    return database.database.idempotency_keys 
+
+def get_outbox_collection():
+    return database.database.outbox
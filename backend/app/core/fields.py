@@ -0,0 +1,62 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """解析 fields 查询参数，按模型字段顺序返回（总是包含 id）；未传入时返回 None"""
+    if not fields:
+        return None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的字段: {', '.join(sorted(unknown))}"
+        )
+
+    requested.add("id")
+    return [name for name in model.model_fields if name in requested]
+
+def build_projection(
+    fields: List[str],
+    field_map: Optional[Dict[str, Optional[str]]] = None,
+    extra: Iterable[str] = ()
+) -> dict:
+    """将响应字段转换为 Mongo 投影
+
+    field_map 用于响应字段与文档字段不同名的情况，映射为 None 表示该字段不是直接存储的。
+    extra 为服务端额外需要的文档字段（如排序键）。
+    """
+    field_map = field_map or {}
+    projection = {"_id": 1}
+    for field in fields:
+        document_field = field_map.get(field, field)
+        if document_field:
+            projection[document_field] = 1
+    for document_field in extra:
+        projection[document_field] = 1
+    return projection
+
+@lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """生成只包含指定字段的精简响应模型"""
+    return create_model(
+        f"{model.__name__}Partial",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+
+def sparse_response(model: Type[BaseModel], fields: List[str], rows: List[dict], response: Response) -> JSONResponse:
+    """按指定字段构造精简响应，保留已设置的响应头（文档中缺少的可选字段返回 null）"""
+    trimmed = [{field: row.get(field) for field in fields} for row in rows]
+    if settings.FAST_JSON_RESPONSES:
+        return FastJSONResponse(trimmed, headers=dict(response.headers))
+    
+    partial = partial_model(model, tuple(fields))
+    content = [partial(**row) for row in trimmed]
+    return JSONResponse(content=jsonable_encoder(content), headers=dict(response.headers))
@@ -0,0 +1,161 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+from bson import ObjectId
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.database import get_products_collection
+from app.core.inventory import reserve_stock, release_stock
+from app.core.order_store import insert_orders, delete_orders
+from app.core.product_cache import invalidate_product
+
+class FlashSaleInventory:
+    """秒杀商品的进程内库存计数
+
+    扣减在事件循环内同步完成（中间没有 await），因此对单个进程是原子的；
+    落库时仍使用带条件的库存扣减，多进程部署时计数只用于快速拒绝，不会导致超卖。
+    """
+
+    def __init__(self):
+        self._available: Dict[str, int] = {}
+
+    def is_flash_sale(self, product_id: str) -> bool:
+        return product_id in self._available
+
+    def available(self, product_id: str) -> int:
+        return self._available.get(product_id, 0)
+
+    def load(self, stocks: Dict[str, int]) -> None:
+        self._available = dict(stocks)
+
+    def try_reserve(self, product_id: str, quantity: int) -> bool:
+        """预留库存，剩余不足时返回 False"""
+        if self._available.get(product_id, 0) < quantity:
+            return False
+        self._available[product_id] -= quantity
+        return True
+
+    def release(self, product_id: str, quantity: int) -> None:
+        """归还预留的库存"""
+        if product_id in self._available:
+            self._available[product_id] += quantity
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._available)
+
+class FlashSaleOrder:
+    """等待落库的秒杀订单"""
+
+    def __init__(self, order: dict, item: dict):
+        self.order = order
+        self.item = item
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+flash_sale_inventory = FlashSaleInventory()
+flash_sale_queue: Optional[asyncio.Queue] = None
+
+async def load_flash_sale_inventory() -> None:
+    """按 FLASH_SALE_PRODUCT_IDS 从数据库加载秒杀商品的库存"""
+    product_ids = [product_id for product_id in settings.FLASH_SALE_PRODUCT_IDS if ObjectId.is_valid(product_id)]
+    cursor = get_products_collection().find(
+        {"_id": {"$in": [ObjectId(product_id) for product_id in product_ids]}},
+        {"stock": 1}
+    )
+    flash_sale_inventory.load({str(product["_id"]): product["stock"] async for product in cursor})
+
+async def submit_flash_sale_order(order: dict, item: dict) -> None:
+    """将已预留库存的订单放入落库队列并等待写入完成，队列已满时归还库存并返回 503"""
+    pending = FlashSaleOrder(order, item)
+    try:
+        flash_sale_queue.put_nowait(pending)
+    except asyncio.QueueFull:
+        flash_sale_inventory.release(item["product_id"], item["quantity"])
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="下单人数过多，请稍后重试",
+            headers={"Retry-After": "1"}
+        )
+    # 客户端断开时不取消等待中的 Future，订单仍由落库任务写入
+    await asyncio.shield(pending.done)
+
+def _quantities(batch: List[FlashSaleOrder]) -> Dict[str, int]:
+    """按商品汇总订单数量"""
+    totals: Dict[str, int] = defaultdict(int)
+    for pending in batch:
+        totals[pending.item["product_id"]] += pending.item["quantity"]
+    return dict(totals)
+
+def _hold_id(batch: List[FlashSaleOrder]) -> str:
+    """整批扣减的库存预留标记取第一个订单的ID（整批订单一起写入）"""
+    return str(batch[0].order["_id"])
+
+async def _reserve_batch(batch: List[FlashSaleOrder]) -> List[FlashSaleOrder]:
+    """按商品汇总后一次条件扣减数据库库存，返回扣减成功的订单"""
+    if not await reserve_stock(_quantities(batch), _hold_id(batch)):
+        return batch
+
+    # 整批扣减已回滚：数据库库存少于进程内计数（多进程部署或后台修改了库存），改为逐单扣减
+    reserved = []
+    try:
+        for pending in batch:
+            if await reserve_stock(_quantities([pending]), _hold_id([pending])):
+                pending.done.set_exception(HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"商品 {pending.item['product_name']} 已售罄"
+                ))
+            else:
+                reserved.append(pending)
+    except Exception:
+        await release_stock(_quantities(reserved))
+        raise
+    return reserved
+
+async def _persist_batch(batch: List[FlashSaleOrder]) -> None:
+    """批量落库：一次扣减库存，再一次写入所有订单"""
+    try:
+        reserved = await _reserve_batch(batch)
+    finally:
+        for product_id in _quantities(batch):
+            invalidate_product(product_id)
+    if not reserved:
+        return
+
+    try:
+        await insert_orders([(pending.order, [pending.item]) for pending in reserved])
+    except Exception:
+        # 清理可能已部分写入的订单并归还库存
+        await delete_orders([pending.order["_id"] for pending in reserved])
+        await release_stock(_quantities(reserved), _hold_id(batch))
+        raise
+
+    for pending in reserved:
+        pending.done.set_result(None)
+
+async def run_flash_sale_worker() -> None:
+    """从队列中取出秒杀订单，每批最多 FLASH_SALE_BATCH_SIZE 个一起落库"""
+    while True:
+        batch = [await flash_sale_queue.get()]
+        while len(batch) < settings.FLASH_SALE_BATCH_SIZE and not flash_sale_queue.empty():
+            batch.append(flash_sale_queue.get_nowait())
+
+        try:
+            await _persist_batch(batch)
+        except Exception as e:
+            print(f"⚠️ 秒杀订单落库失败: {e}")
+            for pending in batch:
+                if not pending.done.done():
+                    flash_sale_inventory.release(pending.item["product_id"], pending.item["quantity"])
+                    pending.done.set_exception(HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="下单失败，请稍后重试"
+                    ))
+
+async def start_flash_sale() -> Optional[asyncio.Task]:
+    """加载秒杀库存并启动落库任务，未配置秒杀商品时不启动"""
+    global flash_sale_queue
+    if not settings.FLASH_SALE_PRODUCT_IDS:
+        return None
+
+    await load_flash_sale_inventory()
+    flash_sale_queue = asyncio.Queue(maxsize=settings.FLASH_SALE_QUEUE_SIZE)
+    return asyncio.create_task(run_flash_sale_worker())
@@ -0,0 +1,37 @@
+import hashlib
+from typing import Any, Optional
+from fastapi import Request, Response, status
+
+# 订单等私有数据：允许客户端缓存，但每次使用前必须重新验证
+PRIVATE_REVALIDATE = "private, no-cache"
+
+def make_etag(*parts: Any) -> str:
+    """根据内容版本生成强 ETag"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """判断请求的 If-None-Match 是否命中当前 ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    # If-None-Match 使用弱比较，忽略 W/ 前缀
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    cache_control: str
+) -> Optional[Response]:
+    """设置缓存相关响应头；客户端缓存仍有效时返回 304 响应，否则返回 None"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+    if not etag_matches(request, etag):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
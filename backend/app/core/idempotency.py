@@ -0,0 +1,127 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from fastapi import HTTPException, Response, status
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.database import get_idempotency_keys_collection
+from app.core.responses import respond
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# 重放首次结果时附加的响应头
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+
+MAX_KEY_LENGTH = 255
+
+# 等待进行中的相同请求时的轮询间隔（秒）
+POLL_INTERVAL_SECONDS = 0.1
+
+# 保存结果的最大尝试次数（请求已生效，结果必须记录下来）
+COMPLETE_ATTEMPTS = 3
+
+PROCESSING = "processing"
+COMPLETED = "completed"
+
+# 接管超时的幂等键时，根据原处理方记录的资源ID查找已生效的结果：返回 (状态码, 响应体)，未生效时返回 None
+RecoverResult = Callable[[dict], Awaitable[Optional[Tuple[int, Any]]]]
+
+async def claim_idempotency_key(
+    scope: str,
+    user_id: str,
+    key: str,
+    resource_id: Optional[str] = None,
+    recover: Optional[RecoverResult] = None
+) -> Optional[dict]:
+    """占用幂等键
+
+    占用成功返回 None，调用方执行请求后必须调用 complete_idempotency_key 或 release_idempotency_key；
+    键已完成时返回保存的结果记录；相同键的请求正在处理时等待其完成，
+    处理方超过 IDEMPOTENCY_LOCK_SECONDS 仍未完成（如进程崩溃）时接管该键。
+    resource_id 为本次请求将要创建的资源ID（如预先生成的订单ID），随键保存；接管时先用 recover 按原处理方的
+    resource_id 查找已生效的结果，找到时保存并返回该结果，不再重新执行请求。
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_KEY_HEADER} 长度不能超过 {MAX_KEY_LENGTH}"
+        )
+
+    collection = get_idempotency_keys_collection()
+    identity = {"scope": scope, "user_id": user_id, "key": key}
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_SECONDS * 2
+
+    while time.monotonic() < deadline:
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({
+                **identity, "status": PROCESSING, "resource_id": resource_id, "created_at": now, "locked_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = await collection.find_one(identity)
+        if record is None:
+            # 进行中的请求失败后释放了该键，重新占用
+            continue
+        if record["status"] == COMPLETED:
+            return record
+
+        lock_expired_at = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        if record["locked_at"] < lock_expired_at:
+            taken_over = await collection.find_one_and_update(
+                {"_id": record["_id"], "status": PROCESSING, "locked_at": record["locked_at"]},
+                {"$set": {"locked_at": now, "resource_id": resource_id}}
+            )
+            if taken_over:
+                # 原处理方可能已经生效，只是没来得及保存结果
+                result = await recover(record) if recover and record.get("resource_id") else None
+                if result is None:
+                    return None
+                await complete_idempotency_key(scope, user_id, key, *result)
+                return await collection.find_one(identity)
+
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="相同幂等键的请求正在处理中，请稍后重试"
+    )
+
+async def complete_idempotency_key(scope: str, user_id: str, key: str, status_code: int, body: Any) -> None:
+    """保存请求结果，之后携带相同键的请求直接重放；写入失败时重试（重复写入结果相同）"""
+    for attempt in range(1, COMPLETE_ATTEMPTS + 1):
+        try:
+            await get_idempotency_keys_collection().update_one(
+                {"scope": scope, "user_id": user_id, "key": key},
+                {"$set": {
+                    "status": COMPLETED,
+                    "status_code": status_code,
+                    "body": body,
+                    "completed_at": datetime.utcnow()
+                }}
+            )
+            return
+        except Exception:
+            if attempt == COMPLETE_ATTEMPTS:
+                raise
+            await asyncio.sleep(POLL_INTERVAL_SECONDS * attempt)
+
+async def release_idempotency_key(scope: str, user_id: str, key: str) -> None:
+    """请求意外失败时释放幂等键，允许客户端用相同的键重试"""
+    await get_idempotency_keys_collection().delete_one(
+        {"scope": scope, "user_id": user_id, "key": key, "status": PROCESSING}
+    )
+
+def replay_response(record: dict, response: Response) -> Any:
+    """重放保存的结果（错误结果以相同的状态码重新抛出）"""
+    if record["status_code"] >= 400:
+        raise HTTPException(
+            status_code=record["status_code"],
+            detail=record["body"].get("detail"),
+            headers={IDEMPOTENT_REPLAYED_HEADER: "true"}
+        )
+
+    response.headers[IDEMPOTENT_REPLAYED_HEADER] = "true"
+    return respond(record["body"], response)
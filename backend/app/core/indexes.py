@@ -0,0 +1,58 @@
+from pymongo.errors import CollectionInvalid
+from app.core.config import settings
+from app.core.database import get_database
+
+async def create_indexes():
+    """创建（或确认）所有集合的索引，重复执行是安全的"""
+    db = await get_database()
+
+    # 用户集合索引
+    await db.users.create_index("username", unique=True)
+
+    # 商品集合索引：每种列表排序各对应一个“排序键 + _id”复合索引（正反向排序共用），
+    # 价格区间过滤也可走价格索引，保证所有支持的过滤/排序组合都不会全表扫描
+    await db.products.create_index([("created_at", -1), ("_id", -1)])
+    await db.products.create_index([("price", 1), ("_id", 1)])
+    await db.products.create_index([("name", 1), ("_id", 1)])
+    # 只包含带库存预留标记的商品（通常为空），供清理任务查找遗留的标记
+    await db.products.create_index("stock_holds", partialFilterExpression={"stock_holds": {"$exists": True}})
+
+    # 购物车集合索引
+    await db.cart.create_index([("user_id", 1), ("product_id", 1)], unique=True)
+    await db.carts.create_index("user_id", unique=True)
+
+    # 订单集合索引：列表按 created_at + _id 倒序做游标分页，
+    # 用户订单列表与按状态过滤的管理员订单列表各对应一个复合索引
+    await db.orders.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.orders.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+    await db.orders.create_index([("created_at", -1), ("_id", -1)])
+    await db.orders.create_index("order_number", unique=True)
+
+    # 订单归档集合：按块压缩（zstd）存储；订单列表翻过订单集合后在此继续，列表索引与订单集合相同；
+    # 尚未计入归档汇总的订单由部分索引定位（计入后移出索引）
+    try:
+        await db.create_collection("orders_archive", storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}})
+    except CollectionInvalid:
+        pass
+    await db.orders_archive.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.orders_archive.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+    await db.orders_archive.create_index([("created_at", -1), ("_id", -1)])
+    await db.orders_archive.create_index("order_number", unique=True)
+    await db.orders_archive.create_index("rollup_token", partialFilterExpression={"rolled_up": False})
+
+    # 订单项集合索引
+    await db.order_items.create_index("order_id")
+
+    # 幂等键集合索引：同一用户同一接口的键唯一，过期记录由 TTL 索引自动删除
+    await db.idempotency_keys.create_index([("scope", 1), ("user_id", 1), ("key", 1)], unique=True)
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=settings.IDEMPOTENCY_KEY_TTL_HOURS * 3600)
+
+    # outbox 事件集合索引：分别对应领取到期的待处理事件与租约过期的处理中事件，
+    # 已完成的事件保留 OUTBOX_RETENTION_HOURS 后由 TTL 索引删除（失败的事件保留以便排查）
+    await db.outbox.create_index([("status", 1), ("available_at", 1)])
+    await db.outbox.create_index([("status", 1), ("locked_until", 1)])
+    await db.outbox.create_index(
+        "processed_at",
+        expireAfterSeconds=settings.OUTBOX_RETENTION_HOURS * 3600,
+        partialFilterExpression={"status": "done"}
+    )
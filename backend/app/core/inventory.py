@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_products_collection, get_orders_collection
+from app.core.product_cache import invalidate_product
+
+# 扣减成功的商品上临时记录的预留标记（stock_holds.<订单ID>: 数量），用于识别部分失败时哪些扣减已生效；
+# 进程中断遗留的标记由 sweep_stock_holds 按订单是否写入决定归还库存或只移除标记
+STOCK_HOLDS_FIELD = "stock_holds"
+
+def _hold_field(hold_id: str) -> str:
+    return f"{STOCK_HOLDS_FIELD}.{hold_id}"
+
+async def reserve_stock(quantities: Dict[str, int], hold_id: str, session=None) -> List[str]:
+    """一次 bulk_write 按条件扣减多个商品的库存，返回扣减失败的商品ID（库存不足或商品已删除）
+
+    hold_id 为本次扣减对应的订单ID（多个订单一起扣减时取其中一个），用作预留标记的键。
+    每个扣减都带 stock >= 数量 的条件。多个商品时同时写入预留标记：全部成功时移除标记，
+    部分失败时用一次 $in 查询找出已生效的扣减。
+    不在事务中（session 为空）时，部分失败会把已成功的扣减加回去；在事务中时由调用方回滚事务。
+    """
+    product_ids = list(quantities)
+    hold = _hold_field(hold_id) if len(product_ids) > 1 else None
+    operations = []
+    for product_id in product_ids:
+        update = {"$inc": {"stock": -quantities[product_id]}}
+        if hold:
+            update["$set"] = {hold: quantities[product_id]}
+        operations.append(UpdateOne({"_id": ObjectId(product_id), "stock": {"$gte": quantities[product_id]}}, update))
+
+    products_collection = get_products_collection()
+    result = await products_collection.bulk_write(operations, ordered=False, session=session)
+    if result.matched_count == len(operations):
+        if hold:
+            try:
+                await products_collection.bulk_write([
+                    UpdateOne({"_id": ObjectId(product_id)}, {"$unset": {hold: ""}})
+                    for product_id in product_ids
+                ], ordered=False, session=session)
+            except Exception as e:
+                # 扣减已全部生效；不在事务中时遗留的标记由清理任务移除（订单写入后只移除标记，不会归还库存）
+                if session is not None:
+                    raise
+                print(f"⚠️ 移除库存预留标记失败: {e}")
+        return []
+    if hold is None:
+        return product_ids
+
+    cursor = products_collection.find(
+        {"_id": {"$in": [ObjectId(product_id) for product_id in product_ids]}, hold: {"$exists": True}},
+        {"_id": 1},
+        session=session
+    )
+    reserved = [str(product["_id"]) async for product in cursor]
+    failed = [product_id for product_id in product_ids if product_id not in reserved]
+    if reserved:
+        # 移除预留标记；不在事务中时同时归还已扣减的库存（以标记存在为条件，与清理任务不会重复归还）
+        compensate = session is None
+        await products_collection.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(product_id), hold: {"$exists": True}},
+                {"$unset": {hold: ""}, **({"$inc": {"stock": quantities[product_id]}} if compensate else {})}
+            )
+            for product_id in reserved
+        ], ordered=False, session=session)
+    return failed
+
+async def release_stock(quantities: Dict[str, int], hold_id: Optional[str] = None, session=None) -> None:
+    """一次 bulk_write 归还库存（预留失败或下单失败时的补偿），同时移除 hold_id 对应的预留标记"""
+    if not quantities:
+        return
+
+    update = {"$unset": {_hold_field(hold_id): ""}} if hold_id else {}
+    operations = [
+        UpdateOne({"_id": ObjectId(product_id)}, {"$inc": {"stock": quantity}, **update})
+        for product_id, quantity in quantities.items()
+    ]
+    await get_products_collection().bulk_write(operations, ordered=False, session=session)
+
+async def sweep_stock_holds(older_than: datetime) -> int:
+    """处理 older_than 之前留下的库存预留标记（进程在扣减与移除标记之间中断），返回处理的标记数
+
+    标记对应的订单已写入时只移除标记，否则归还库存并移除标记；归还以标记存在为条件，重复执行不会重复归还。
+    """
+    products_collection = get_products_collection()
+    cutoff = ObjectId.from_datetime(older_than)
+    stale = []
+    async for product in products_collection.find({STOCK_HOLDS_FIELD: {"$exists": True}}, {STOCK_HOLDS_FIELD: 1}):
+        for hold_id, quantity in product[STOCK_HOLDS_FIELD].items():
+            if ObjectId.is_valid(hold_id) and ObjectId(hold_id) < cutoff:
+                stale.append((product["_id"], hold_id, quantity))
+    if not stale:
+        return 0
+
+    order_ids = list({ObjectId(hold_id) for _, hold_id, _ in stale})
+    cursor = get_orders_collection().find({"_id": {"$in": order_ids}}, {"_id": 1})
+    placed = {str(order["_id"]) async for order in cursor}
+
+    operations = []
+    for product_id, hold_id, quantity in stale:
+        hold = _hold_field(hold_id)
+        if hold_id in placed:
+            operations.append(UpdateOne({"_id": product_id}, {"$unset": {hold: ""}}))
+        else:
+            operations.append(UpdateOne(
+                {"_id": product_id, hold: {"$exists": True}},
+                {"$inc": {"stock": quantity}, "$unset": {hold: ""}}
+            ))
+    await products_collection.bulk_write(operations, ordered=False)
+    for product_id in {product_id for product_id, _, _ in stale}:
+        invalidate_product(str(product_id))
+    return len(stale)
+
+async def run_stock_hold_sweeper() -> None:
+    """每隔 STOCK_HOLD_TIMEOUT_SECONDS / 2 秒清理一次超过 STOCK_HOLD_TIMEOUT_SECONDS 秒的预留标记（启动时先执行一次）"""
+    while True:
+        try:
+            swept = await sweep_stock_holds(datetime.utcnow() - timedelta(seconds=settings.STOCK_HOLD_TIMEOUT_SECONDS))
+            if swept:
+                print(f"🧹 已清理 {swept} 个遗留的库存预留标记")
+        except Exception as e:
+            print(f"⚠️ 清理库存预留标记失败: {e}")
+        await asyncio.sleep(settings.STOCK_HOLD_TIMEOUT_SECONDS / 2)
+
+def start_stock_hold_sweeper() -> asyncio.Task:
+    """启动库存预留标记的定期清理任务"""
+    return asyncio.create_task(run_stock_hold_sweeper())
@@ -0,0 +1,205 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_orders_collection, get_order_items_collection, get_orders_archive_collection, get_order_archive_summary_collection, get_archived_product_sales_collection
+from app.core.order_store import EMBEDDED_ITEMS_FIELD, ITEM_COUNT_FIELD, has_embedded_items, delete_orders
+
+# 归档时间字段
+ARCHIVED_AT_FIELD = "archived_at"
+
+# 归档订单计入汇总的标记：同一批写入的订单共用一个 rollup_token，计入汇总后置 rolled_up 为 True 并移除 token
+ROLLUP_TOKEN_FIELD = "rollup_token"
+ROLLED_UP_FIELD = "rolled_up"
+
+# 归档汇总文档的ID；汇总文档与商品销量文档中保留最近计入的 token，用于跳过重复计入
+ARCHIVE_SUMMARY_ID = "orders"
+APPLIED_ROLLUPS_FIELD = "applied_rollups"
+APPLIED_ROLLUPS_KEPT = 100
+
+async def find_order(query: dict) -> Optional[dict]:
+    """查找订单，订单集合中没有时查找归档集合（归档订单内嵌订单项，load_order_items 可直接读取）"""
+    order = await get_orders_collection().find_one(query)
+    if order is None:
+        order = await get_orders_archive_collection().find_one(query)
+    return order
+
+async def find_orders(query: dict, projection: dict, sort: list, limit: Optional[int] = None) -> List[dict]:
+    """按 sort（创建时间倒序）读取订单列表，订单集合中不足 limit 个时从归档集合补齐，limit 为空时返回全部
+
+    归档按创建时间从旧到新进行，归档订单都排在订单集合中的订单之后，两个集合的结果依次拼接即为整体顺序；
+    游标取自归档订单时，订单集合中没有更早的订单，直接从归档集合继续。
+    """
+    cursor = get_orders_collection().find(query, projection).sort(sort)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    orders = await cursor.to_list(length=limit)
+    if limit is not None and len(orders) >= limit:
+        return orders
+
+    remaining = None if limit is None else limit - len(orders)
+    cursor = get_orders_archive_collection().find(query, projection).sort(sort)
+    if remaining is not None:
+        cursor = cursor.limit(remaining)
+    return orders + await cursor.to_list(length=remaining)
+
+async def _load_separate_items(orders: List[dict]) -> Dict[str, List[dict]]:
+    """一次读取多个订单存放在 order_items 集合中的订单项，按订单ID分组"""
+    order_ids = [str(order["_id"]) for order in orders if not has_embedded_items(order)]
+    items: Dict[str, List[dict]] = defaultdict(list)
+    if order_ids:
+        async for item in get_order_items_collection().find({"order_id": {"$in": order_ids}}):
+            items[item.pop("order_id")].append(item)
+    return items
+
+async def archived_order_summary() -> dict:
+    """已归档订单的汇总：订单数、总收入与按状态的订单数"""
+    summary = await get_order_archive_summary_collection().find_one({"_id": ARCHIVE_SUMMARY_ID})
+    return {
+        "order_count": summary["order_count"] if summary else 0,
+        "revenue": summary["revenue"] if summary else 0,
+        "status_counts": summary["status_counts"] if summary else {}
+    }
+
+def archived_product_sales_pipeline() -> dict:
+    """并入已归档订单商品销量的聚合阶段，文档结构与 order_items 一致，另带 order_count（该商品的订单项数）"""
+    return {"$unionWith": {
+        "coll": get_archived_product_sales_collection().name,
+        "pipeline": [{"$project": {"_id": 0, "product_id": "$_id", "quantity": 1, "order_count": 1}}]
+    }}
+
+def _applied_once(token: str, increments: dict) -> dict:
+    """只在 token 尚未计入时生效的累加"""
+    return {
+        "$inc": increments,
+        "$push": {APPLIED_ROLLUPS_FIELD: {"$each": [token], "$slice": -APPLIED_ROLLUPS_KEPT}}
+    }
+
+async def _apply_rollup(token: str) -> None:
+    """把同一批归档的订单计入汇总文档与商品销量
+
+    每次累加都以 token 不在 applied_rollups 中为条件，中途失败后重新执行不会重复计入。
+    """
+    archive_collection = get_orders_archive_collection()
+    match = {"$match": {ROLLUP_TOKEN_FIELD: token, ROLLED_UP_FIELD: False}}
+
+    status_groups = await archive_collection.aggregate([
+        match,
+        {"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}}
+    ]).to_list(length=None)
+    if status_groups:
+        summary_collection = get_order_archive_summary_collection()
+        await summary_collection.update_one(
+            {"_id": ARCHIVE_SUMMARY_ID},
+            {"$setOnInsert": {"order_count": 0, "revenue": 0, "status_counts": {}, APPLIED_ROLLUPS_FIELD: []}},
+            upsert=True
+        )
+        increments = {
+            "order_count": sum(group["count"] for group in status_groups),
+            "revenue": sum(group["revenue"] for group in status_groups)
+        }
+        for group in status_groups:
+            increments[f"status_counts.{group['_id']}"] = group["count"]
+        await summary_collection.update_one(
+            {"_id": ARCHIVE_SUMMARY_ID, APPLIED_ROLLUPS_FIELD: {"$ne": token}},
+            _applied_once(token, increments)
+        )
+
+    product_groups = await archive_collection.aggregate([
+        match,
+        {"$unwind": f"${EMBEDDED_ITEMS_FIELD}"},
+        {"$group": {
+            "_id": f"${EMBEDDED_ITEMS_FIELD}.product_id",
+            "quantity": {"$sum": f"${EMBEDDED_ITEMS_FIELD}.quantity"},
+            "order_count": {"$sum": 1}
+        }}
+    ]).to_list(length=None)
+    if product_groups:
+        operations = []
+        for group in product_groups:
+            operations.append(UpdateOne(
+                {"_id": group["_id"]},
+                {"$setOnInsert": {"quantity": 0, "order_count": 0, APPLIED_ROLLUPS_FIELD: []}},
+                upsert=True
+            ))
+            operations.append(UpdateOne(
+                {"_id": group["_id"], APPLIED_ROLLUPS_FIELD: {"$ne": token}},
+                _applied_once(token, {"quantity": group["quantity"], "order_count": group["order_count"]})
+            ))
+        await get_archived_product_sales_collection().bulk_write(operations)
+
+    await archive_collection.update_many(
+        {ROLLUP_TOKEN_FIELD: token, ROLLED_UP_FIELD: False},
+        {"$set": {ROLLED_UP_FIELD: True}, "$unset": {ROLLUP_TOKEN_FIELD: ""}}
+    )
+
+async def roll_up_archived_orders() -> None:
+    """把尚未计入汇总的归档订单逐批计入（包括之前中途失败的批次）"""
+    tokens = await get_orders_archive_collection().distinct(ROLLUP_TOKEN_FIELD, {ROLLED_UP_FIELD: False})
+    for token in tokens:
+        await _apply_rollup(token)
+
+async def archive_orders_before(cutoff: datetime, batch_size: int = None) -> int:
+    """将 cutoff 之前创建的订单移入归档集合，返回归档的订单数量
+
+    每批订单先以内嵌订单项的形式写入归档集合（按 _id 只在不存在时写入），再从订单与订单项集合中删除，
+    最后计入归档汇总（统计接口与仪表板只读汇总，不扫描归档集合）；中途失败后重新执行不会丢失、重复订单或重复计入。
+    """
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    archived = 0
+    while True:
+        orders = await get_orders_collection().find(
+            {"created_at": {"$lt": cutoff}}
+        ).sort([("created_at", 1), ("_id", 1)]).limit(batch_size).to_list(length=None)
+        if not orders:
+            await roll_up_archived_orders()
+            return archived
+
+        separate_items = await _load_separate_items(orders)
+        now = datetime.utcnow()
+        token = str(ObjectId())
+        operations = []
+        for order in orders:
+            items = order.get(EMBEDDED_ITEMS_FIELD)
+            if items is None:
+                items = separate_items[str(order["_id"])]
+            archived_order = {
+                **order,
+                EMBEDDED_ITEMS_FIELD: items,
+                ITEM_COUNT_FIELD: len(items),
+                ARCHIVED_AT_FIELD: now,
+                ROLLUP_TOKEN_FIELD: token,
+                ROLLED_UP_FIELD: False
+            }
+            archived_order.pop("_id")
+            # 已写入过的订单（上次中途失败）保留原有的 token，由原批次计入汇总
+            operations.append(UpdateOne({"_id": order["_id"]}, {"$setOnInsert": archived_order}, upsert=True))
+
+        await get_orders_archive_collection().bulk_write(operations, ordered=False)
+        await delete_orders([order["_id"] for order in orders])
+        await roll_up_archived_orders()
+        archived += len(orders)
+
+async def archive_orders() -> int:
+    """归档创建时间超过 ORDER_ARCHIVE_AFTER_DAYS 天的订单"""
+    return await archive_orders_before(datetime.utcnow() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS))
+
+async def run_order_archiver() -> None:
+    """每隔 ORDER_ARCHIVE_INTERVAL_HOURS 小时执行一次归档"""
+    while True:
+        try:
+            archived = await archive_orders()
+            if archived:
+                print(f"🗄️ 已归档 {archived} 个订单")
+        except Exception as e:
+            print(f"⚠️ 订单归档失败: {e}")
+        await asyncio.sleep(settings.ORDER_ARCHIVE_INTERVAL_HOURS * 3600)
+
+def start_order_archiver() -> Optional[asyncio.Task]:
+    """启动定期归档任务，ORDER_ARCHIVE_AFTER_DAYS 为 0 时不归档"""
+    if not settings.ORDER_ARCHIVE_AFTER_DAYS:
+        return None
+    return asyncio.create_task(run_order_archiver())
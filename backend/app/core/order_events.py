@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from bson import ObjectId
+from app.core.cart_store import get_cart_store
+from app.core.database import get_orders_collection
+from app.core.outbox import enqueue_event, outbox_handler
+
+# 购物车下单成功后的事件，由 outbox 处理任务执行下单后的后续处理
+ORDER_CREATED = "order_created"
+
+# 事件先于订单写入；超过该时长订单仍不存在，视为订单写入失败，事件不再处理
+ORDER_WRITE_GRACE_SECONDS = 300
+
+async def publish_order_created(order: dict, items: List[dict], session=None) -> None:
+    """写入下单事件，须在写入订单之前调用（传入 session 时与订单在同一事务中提交）
+
+    先写事件再写订单：进程在两次写入之间中断时不会出现没有事件的订单；
+    订单最终没有写入时，处理函数确认订单不存在后放弃处理。
+    """
+    await enqueue_event(ORDER_CREATED, {
+        "order_id": str(order["_id"]),
+        "user_id": order["user_id"],
+        "product_ids": [item["product_id"] for item in items],
+        "created_at": order["created_at"]
+    }, session=session)
+
+@outbox_handler(ORDER_CREATED)
+async def handle_order_created(payload: Dict[str, Any]) -> None:
+    """补充移除购物车中已下单的商品
+
+    下单接口在写入订单后已同步移除购物车项；这里只处理进程在两者之间中断的情况，
+    只移除订单创建后没有修改过的购物车项，重复执行结果相同。订单尚未写入时抛出异常，稍后重试。
+    """
+    order = await get_orders_collection().find_one({"_id": ObjectId(payload["order_id"])}, {"created_at": 1})
+    if order is None:
+        created_at = payload.get("created_at")
+        if created_at is None or created_at < datetime.utcnow() - timedelta(seconds=ORDER_WRITE_GRACE_SECONDS):
+            return
+        raise LookupError(f"订单 {payload['order_id']} 尚未写入")
+
+    await get_cart_store().remove_products(payload["user_id"], payload["product_ids"], order["created_at"])
@@ -0,0 +1,101 @@
+from typing import List, Tuple
+from bson import ObjectId
+from app.core.config import settings
+from app.core.database import get_orders_collection, get_order_items_collection
+
+# 内嵌存储模式下订单项所在的订单文档字段
+EMBEDDED_ITEMS_FIELD = "items"
+
+# 创建订单时冗余保存的订单项数量
+ITEM_COUNT_FIELD = "item_count"
+
+# 列表查询中的订单项数量投影：优先取冗余字段，其次取内嵌订单项数组长度（不返回数组本身），
+# 两者都没有的旧订单不返回该字段，由 fill_item_counts 补齐
+ITEM_COUNT_EXPRESSION = {"$ifNull": [
+    f"${ITEM_COUNT_FIELD}",
+    {"$cond": [{"$isArray": f"${EMBEDDED_ITEMS_FIELD}"}, {"$size": f"${EMBEDDED_ITEMS_FIELD}"}, "$$REMOVE"]}
+]}
+
+def has_embedded_items(order: dict) -> bool:
+    """订单文档是否内嵌了订单项（迁移前的旧订单与 separate 模式写入的订单没有）"""
+    return EMBEDDED_ITEMS_FIELD in order
+
+async def insert_order(order: dict, items: List[dict], session=None) -> None:
+    """写入订单：embedded 模式一次写入内嵌订单项的订单文档，separate 模式订单项批量写入 order_items"""
+    await insert_orders([(order, items)], session=session)
+
+async def insert_orders(entries: List[Tuple[dict, List[dict]]], session=None) -> None:
+    """批量写入多个订单（订单文档与订单项各一次 insert_many），entries 为 (订单, 订单项) 列表
+
+    订单文档须预先生成 _id（订单项按该 _id 关联）。
+    """
+    embedded = settings.ORDER_STORAGE_MODE == "embedded"
+    for order, items in entries:
+        order[ITEM_COUNT_FIELD] = len(items)
+        if embedded:
+            order[EMBEDDED_ITEMS_FIELD] = items
+
+    # separate 模式先写订单项再写订单：订单一旦可见，订单项已经完整（迁移脚本在应用运行时执行也不会漏掉订单项）
+    if not embedded:
+        rows = [dict(item, order_id=str(order["_id"])) for order, items in entries for item in items]
+        if rows:
+            await get_order_items_collection().insert_many(rows, session=session)
+
+    await get_orders_collection().insert_many([order for order, _ in entries], session=session)
+
+async def delete_orders(order_ids: List[ObjectId], session=None) -> None:
+    """删除订单及其订单项（用于清理写入失败的订单）"""
+    await get_orders_collection().delete_many({"_id": {"$in": order_ids}}, session=session)
+    await get_order_items_collection().delete_many(
+        {"order_id": {"$in": [str(order_id) for order_id in order_ids]}},
+        session=session
+    )
+
+async def load_order_items(order: dict) -> List[dict]:
+    """读取订单项，两种存储的订单都兼容"""
+    if has_embedded_items(order):
+        return order[EMBEDDED_ITEMS_FIELD]
+    return await get_order_items_collection().find({"order_id": str(order["_id"])}).to_list(length=None)
+
+def with_item_count(projection: dict) -> dict:
+    """在订单列表投影中加入订单项数量"""
+    return {**projection, ITEM_COUNT_FIELD: ITEM_COUNT_EXPRESSION}
+
+async def fill_item_counts(orders: List[dict]) -> None:
+    """为缺少订单项数量的旧订单补齐 item_count，所有缺失的订单合并为一次聚合查询"""
+    missing = [str(order["_id"]) for order in orders if ITEM_COUNT_FIELD not in order]
+    if not missing:
+        return
+
+    counts = {order_id: 0 for order_id in missing}
+    pipeline = [
+        {"$match": {"order_id": {"$in": missing}}},
+        {"$group": {"_id": "$order_id", "count": {"$sum": 1}}}
+    ]
+    async for row in get_order_items_collection().aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+
+    for order in orders:
+        if ITEM_COUNT_FIELD not in order:
+            order[ITEM_COUNT_FIELD] = counts[str(order["_id"])]
+
+def all_order_items_pipeline(stages: List[dict]) -> List[dict]:
+    """在 order_items 集合上执行、同时覆盖内嵌订单项的聚合管道
+
+    内嵌订单项经 $unwind 展开后并入（$unionWith），后续阶段看到的文档结构与 order_items 一致。
+    已归档的订单不在其中，其汇总见 app.core.order_archive。
+    """
+    return [
+        {"$unionWith": {
+            "coll": get_orders_collection().name,
+            "pipeline": [
+                {"$match": {EMBEDDED_ITEMS_FIELD: {"$exists": True}}},
+                {"$unwind": f"${EMBEDDED_ITEMS_FIELD}"},
+                {"$replaceRoot": {"newRoot": {"$mergeObjects": [
+                    f"${EMBEDDED_ITEMS_FIELD}",
+                    {"order_id": {"$toString": "$_id"}}
+                ]}}}
+            ]
+        }},
+        *stages
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.database import get_outbox_collection
+
+# 事件状态：待处理 / 处理中（处理任务持有租约）/ 已完成 / 重试次数用尽
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# 失败重试的最大退避间隔（秒）
+MAX_RETRY_DELAY_SECONDS = 300
+
+OutboxHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_handlers: Dict[str, OutboxHandler] = {}
+_wakeup = asyncio.Event()
+
+def outbox_handler(event_type: str) -> Callable[[OutboxHandler], OutboxHandler]:
+    """注册事件处理函数
+
+    事件至少投递一次（处理失败或处理任务中断后会重新投递），处理函数必须是幂等的。
+    """
+    def register(handler: OutboxHandler) -> OutboxHandler:
+        _handlers[event_type] = handler
+        return handler
+    return register
+
+async def enqueue_event(event_type: str, payload: Dict[str, Any], session=None) -> None:
+    """写入待处理事件，传入 session 时与业务数据在同一事务中提交"""
+    now = datetime.utcnow()
+    await get_outbox_collection().insert_one({
+        "type": event_type,
+        "payload": payload,
+        "status": PENDING,
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now
+    }, session=session)
+
+def wake_outbox_workers() -> None:
+    """事件提交后唤醒本进程的处理任务，不必等到下一次轮询"""
+    _wakeup.set()
+
+async def _claim_event() -> Optional[dict]:
+    """领取一个到期的待处理事件（或租约已过期的处理中事件），没有时返回 None"""
+    now = datetime.utcnow()
+    return await get_outbox_collection().find_one_and_update(
+        {"$or": [
+            {"status": PENDING, "available_at": {"$lte": now}},
+            {"status": PROCESSING, "locked_until": {"$lt": now}}
+        ]},
+        {
+            "$set": {"status": PROCESSING, "locked_until": now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)},
+            "$inc": {"attempts": 1}
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def _process_event(event: dict) -> None:
+    """执行事件处理函数并记录结果，失败时按指数退避重新排队"""
+    try:
+        handler = _handlers.get(event["type"])
+        if handler is None:
+            raise LookupError(f"未注册的事件类型: {event['type']}")
+        await handler(event["payload"])
+        update = {"status": DONE, "processed_at": datetime.utcnow()}
+    except Exception as e:
+        now = datetime.utcnow()
+        if event["attempts"] >= settings.OUTBOX_MAX_ATTEMPTS:
+            print(f"⚠️ 事件 {event['_id']} ({event['type']}) 处理失败，已达到最大重试次数: {e}")
+            update = {"status": FAILED, "last_error": str(e), "processed_at": now}
+        else:
+            delay = min(2 ** event["attempts"], MAX_RETRY_DELAY_SECONDS)
+            update = {"status": PENDING, "last_error": str(e), "available_at": now + timedelta(seconds=delay)}
+
+    # 只在仍持有租约时更新，租约过期后事件可能已被其他处理任务重新领取
+    await get_outbox_collection().update_one(
+        {"_id": event["_id"], "status": PROCESSING, "locked_until": event["locked_until"]},
+        {"$set": update, "$unset": {"locked_until": ""}}
+    )
+
+async def run_outbox_worker() -> None:
+    """持续处理到期事件；没有事件时等待唤醒或 OUTBOX_POLL_SECONDS 后重新轮询"""
+    while True:
+        # 先清除唤醒标记再领取，领取之后写入的事件一定能唤醒等待
+        _wakeup.clear()
+        try:
+            event = await _claim_event()
+            if event is not None:
+                await _process_event(event)
+                continue
+        except Exception as e:
+            # 结果未能记录的事件在租约过期后重新投递
+            print(f"⚠️ 处理事件失败: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+def start_outbox_workers() -> List[asyncio.Task]:
+    """启动 OUTBOX_WORKERS 个事件处理任务"""
+    return [asyncio.create_task(run_outbox_worker()) for _ in range(settings.OUTBOX_WORKERS)]
+
+async def outbox_stats() -> Dict[str, int]:
+    """各状态的事件数量"""
+    cursor = get_outbox_collection().aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+    return {group["_id"]: group["count"] async for group in cursor}
@@ -0,0 +1,58 @@
+import base64
+from typing import Any, List, Optional, Sequence, Tuple
+from bson import json_util
+from fastapi import HTTPException, status
+
+# 排序规格：[(字段, 1 升序 / -1 降序), ...]，最后一项应为 _id 以保证顺序唯一
+SortSpec = Sequence[Tuple[str, int]]
+
+# 下一页游标通过响应头返回，保持列表响应体结构不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(document: dict, sort: SortSpec) -> str:
+    """根据文档的排序键生成不透明的分页游标"""
+    payload = {
+        "k": [[field, direction] for field, direction in sort],
+        "v": [document.get(field) for field, _ in sort]
+    }
+    raw = json_util.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort: SortSpec) -> List[Any]:
+    """解析分页游标，返回排序键取值"""
+    invalid_cursor = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="无效的分页游标"
+    )
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise invalid_cursor
+
+    if not isinstance(payload, dict) or payload.get("k") != [[field, direction] for field, direction in sort]:
+        raise invalid_cursor
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise invalid_cursor
+    return values
+
+def keyset_filter(sort: SortSpec, values: Sequence[Any]) -> dict:
+    """构造“排在游标之后”的查询条件"""
+    clauses = []
+    for index, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[i] for i, (prev_field, _) in enumerate(sort[:index])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[index]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+def apply_cursor(query: dict, sort: SortSpec, cursor: Optional[str]) -> dict:
+    """在查询条件上叠加游标分页条件"""
+    if not cursor:
+        return query
+
+    after_cursor = keyset_filter(sort, decode_cursor(cursor, sort))
+    if not query:
+        return after_cursor
+    return {"$and": [query, after_cursor]}
@@ -0,0 +1,52 @@
+from typing import Dict, Iterable, Optional
+from bson import ObjectId
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_products_collection
+
+# 商品缓存（按商品ID字符串索引），缓存的文档为只读，调用方不得修改
+product_cache = TTLCache(settings.PRODUCT_CACHE_MAX_SIZE, settings.PRODUCT_CACHE_TTL_SECONDS)
+
+async def get_product_by_id(product_id: str, fresh: bool = False) -> Optional[dict]:
+    """按ID读取商品（读穿缓存），库存敏感的路径传入 fresh=True 强制读库"""
+    if not fresh:
+        product = product_cache.get(product_id)
+        if product is not None:
+            return product
+
+    products_collection = get_products_collection()
+    product = await products_collection.find_one({"_id": ObjectId(product_id)})
+    if product:
+        product_cache.set(product_id, product)
+    else:
+        product_cache.invalidate(product_id)
+    return product
+
+async def get_products_by_ids(product_ids: Iterable[str], fresh: bool = False) -> Dict[str, dict]:
+    """批量读取商品（读穿缓存），未命中的商品用一次 $in 查询补齐；返回 {商品ID: 商品}，不存在的商品不在结果中"""
+    products: Dict[str, dict] = {}
+    missing = []
+    for product_id in dict.fromkeys(product_ids):
+        product = None if fresh else product_cache.get(product_id)
+        if product is not None:
+            products[product_id] = product
+        else:
+            missing.append(product_id)
+
+    if missing:
+        products_collection = get_products_collection()
+        cursor = products_collection.find({"_id": {"$in": [ObjectId(product_id) for product_id in missing]}})
+        async for product in cursor:
+            product_id = str(product["_id"])
+            product_cache.set(product_id, product)
+            products[product_id] = product
+
+    return products
+
+def cache_product(product: dict) -> None:
+    """写入后直接用最新的商品文档刷新缓存"""
+    product_cache.set(str(product["_id"]), product)
+
+def invalidate_product(product_id: str) -> None:
+    """商品写入后使缓存失效"""
+    product_cache.invalidate(product_id)
@@ -0,0 +1,33 @@
+from typing import Any, Optional
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.core.config import settings
+
+def _default(value: Any) -> Any:
+    """orjson 无法直接编码的类型"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+class FastJSONResponse(JSONResponse):
+    """基于 orjson 的 JSON 响应，直接编码 datetime、枚举和 ObjectId"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def respond(content: Any, response: Optional[Response] = None) -> Any:
+    """返回接口响应内容
+
+    开启 FAST_JSON_RESPONSES 时直接输出 orjson 编码的响应，跳过 response_model 的二次校验，
+    因此 content 必须是已按响应模型结构组装好的可信数据；response 中已设置的响应头会被保留。
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return content
+
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, headers=headers)
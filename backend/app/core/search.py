@@ -0,0 +1,187 @@
+import heapq
+import math
+import re
+from array import array
+from typing import Dict, List, Optional, Sequence, Union
+from app.core.database import get_products_collection
+
+# 中日韩字符连续片段 / 拉丁字母与数字连续片段
+_CJK_RUN = r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+_WORD_RUN = r"[a-z0-9]+"
+_TOKEN_PATTERN = re.compile(f"({_CJK_RUN})|({_WORD_RUN})")
+
+# 字段权重：名称命中比描述命中更重要
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+# 检索词：拉丁字母与数字的词为字符串，中日韩单字与二元组为整数
+Token = Union[str, int]
+
+# 每个查询词最多参与评分的商品数（取倒排列表中最新加入的），高频词的倒排列表再长，单次检索的耗时也有上限
+MAX_SCORED_POSTINGS = 2000
+
+# 查询最多使用的词数（优先使用倒排列表最短、区分度最高的词）
+MAX_QUERY_TOKENS = 8
+
+# 已删除的商品数超过有效商品数（且不少于该值）时压缩倒排列表
+COMPACT_MIN_REMOVED = 10000
+
+def tokenize(text: str, for_query: bool = False) -> List[Token]:
+    """切分文本：中日韩字符按二元组切分（同时保留单字），拉丁字母与数字按词切分
+
+    中日韩单字与二元组以码位整数表示（二元组为 前一字码位 << 21 | 后一字码位），比短字符串省内存；
+    for_query 时单字只在片段本身只有一个字时使用，避免高频单字拖慢检索；
+    商品描述也按这种方式切分，以减少索引的词数（单字查询只匹配名称）。
+    """
+    tokens: List[Token] = []
+    for cjk_run, word in _TOKEN_PATTERN.findall(text.lower()):
+        if word:
+            tokens.append(word)
+            continue
+
+        code_points = [ord(character) for character in cjk_run]
+        if len(code_points) == 1 or not for_query:
+            tokens.extend(code_points)
+        tokens.extend(first << 21 | second for first, second in zip(code_points, code_points[1:]))
+    return tokens
+
+class ProductSearchIndex:
+    """商品名称与描述的进程内倒排索引
+
+    每个商品分配一个递增的整数文档号，倒排列表中每一项为 文档号 * 2 + 是否名称命中；
+    只有一项的倒排列表（大多数低频词）直接存整数，其余存为紧凑的整数数组，不保存每个商品的分词结果。
+    更新商品时旧文档号标记为已删除并重新分配文档号，已删除的文档号在检索时跳过，积累过多时整体压缩。
+    多进程部署时每个进程各自维护索引，其他进程的写入在重启或重建后才可见。
+    """
+
+    def __init__(self):
+        self._product_ids: List[Optional[str]] = []
+        self._signatures = array("q")
+        self._doc_numbers: Dict[str, int] = {}
+        self._postings: Dict[Token, Union[int, array]] = {}
+        self._removed = 0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add(self, product_id: str, name: str, description: str) -> None:
+        """添加或更新商品，名称与描述未变化时不做任何修改"""
+        signature = hash((name, description))
+        doc = self._doc_numbers.get(product_id)
+        if doc is not None and self._signatures[doc] == signature:
+            return
+        self.remove(product_id)
+
+        doc = len(self._product_ids)
+        self._product_ids.append(product_id)
+        self._signatures.append(signature)
+        self._doc_numbers[product_id] = doc
+
+        name_tokens = set(tokenize(name))
+        for token in name_tokens:
+            self._append(token, doc * 2 + 1)
+        for token in set(tokenize(description, for_query=True)) - name_tokens:
+            self._append(token, doc * 2)
+
+    def _append(self, token: Token, entry: int) -> None:
+        posting = self._postings.get(token)
+        if posting is None:
+            self._postings[token] = entry
+        elif type(posting) is int:
+            self._postings[token] = array("i", (posting, entry))
+        else:
+            posting.append(entry)
+
+    @staticmethod
+    def _as_entries(posting: Union[int, array]) -> Sequence[int]:
+        return (posting,) if type(posting) is int else posting
+
+    def remove(self, product_id: str) -> None:
+        """删除商品"""
+        doc = self._doc_numbers.pop(product_id, None)
+        if doc is None:
+            return
+
+        self._product_ids[doc] = None
+        self._removed += 1
+        if self._removed >= COMPACT_MIN_REMOVED and self._removed > len(self._doc_numbers):
+            self._compact()
+
+    def _compact(self) -> None:
+        """去掉已删除的文档号并重新编号（按有效商品数摊销，不会频繁执行）"""
+        renumbered = array("i", [-1]) * len(self._product_ids)
+        product_ids: List[Optional[str]] = []
+        signatures = array("q")
+        for doc, product_id in enumerate(self._product_ids):
+            if product_id is not None:
+                renumbered[doc] = len(product_ids)
+                product_ids.append(product_id)
+                signatures.append(self._signatures[doc])
+
+        postings = self._postings
+        self._postings = {}
+        for token in postings:
+            for entry in self._as_entries(postings[token]):
+                doc = renumbered[entry >> 1]
+                if doc >= 0:
+                    self._append(token, doc * 2 + (entry & 1))
+
+        self._product_ids = product_ids
+        self._signatures = signatures
+        self._doc_numbers = {product_id: doc for doc, product_id in enumerate(product_ids)}
+        self._removed = 0
+
+    def clear(self) -> None:
+        """清空索引"""
+        self.__init__()
+
+    def search(self, query: str, limit: int) -> List[str]:
+        """检索商品，返回按相关度排序的商品ID列表"""
+        matched = [
+            self._as_entries(self._postings[token])
+            for token in set(tokenize(query, for_query=True))
+            if token in self._postings
+        ]
+        if not matched:
+            return []
+
+        # 出现在过半商品中的查询词区分度很低，有其他查询词时跳过
+        total = len(self._product_ids)
+        selective = [entries for entries in matched if len(entries) * 2 <= total]
+        if selective:
+            matched = selective
+        matched = sorted(matched, key=len)[:MAX_QUERY_TOKENS]
+
+        scores: Dict[int, float] = {}
+        for entries in matched:
+            idf = math.log(1 + total / len(entries))
+            weights = (DESCRIPTION_WEIGHT * idf, NAME_WEIGHT * idf)
+            for entry in entries[-MAX_SCORED_POSTINGS:]:
+                doc = entry >> 1
+                scores[doc] = scores.get(doc, 0.0) + weights[entry & 1]
+
+        product_ids = self._product_ids
+        ranked = heapq.nlargest(
+            limit,
+            (doc for doc in scores if product_ids[doc] is not None),
+            key=scores.__getitem__
+        )
+        return [product_ids[doc] for doc in ranked]
+
+# 全局商品检索索引
+product_search_index = ProductSearchIndex()
+
+async def build_product_search_index(batch_size: int = 1000):
+    """从数据库全量构建商品检索索引，构建完成前检索接口返回 503"""
+    products_collection = get_products_collection()
+
+    try:
+        product_search_index.clear()
+        cursor = products_collection.find({}, {"name": 1, "description": 1}).batch_size(batch_size)
+        async for product in cursor:
+            product_search_index.add(str(product["_id"]), product.get("name", ""), product.get("description", ""))
+        product_search_index.ready = True
+        print(f"🔍 商品检索索引构建完成，共 {len(product_search_index)} 个商品")
+    except Exception as e:
+        print(f"⚠️ 商品检索索引构建失败: {e}")
@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
@@ -12,6 +14,13 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # HTTP Bearer 认证
 security = HTTPBearer()
 
+# 密码哈希线程池（bcrypt 计算时会释放 GIL，不阻塞事件循环）
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_hash_pending = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,6 +29,36 @@ def get_password_hash(password: str) -> str:
     """生成密码哈希"""
     return pwd_context.hash(password)
 
+async def _run_hash_task(func: Callable[..., Any], *args: Any) -> Any:
+    """在哈希线程池中执行任务，排队已满时快速返回 503"""
+    global _hash_pending
+    
+    if _hash_pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+    
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在线程池中验证密码"""
+    return await _run_hash_task(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """在线程池中生成密码哈希"""
+    return await _run_hash_task(get_password_hash, password)
+
+def shutdown_hash_executor():
+    """关闭密码哈希线程池"""
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建JWT访问令牌"""
     to_encode = data.copy()
@@ -32,8 +71,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """验证JWT令牌"""
+def verify_token_payload(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """验证JWT令牌并返回全部声明"""
     token = credentials.credentials
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -46,6 +85,10 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        return username
+        return payload
     except JWTError:
-        raise credentials_exception 
\ No newline at end of file
+        raise credentials_exception
+
+def verify_token(payload: dict = Depends(verify_token_payload)):
+    """验证JWT令牌"""
+    return payload["sub"]
\ No newline at end of file
@@ -4,8 +4,17 @@ from fastapi.responses import RedirectResponse
 from app.core.config import settings
 from app.api import auth, users, products, cart, orders, admin
 from app.core.database import connect_to_mongo, close_mongo_connection, get_database
-from app.core.security import get_password_hash
+from app.core.indexes import create_indexes
+from app.core.search import build_product_search_index
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.idempotency import IDEMPOTENT_REPLAYED_HEADER
+from app.core.flash_sale import start_flash_sale
+from app.core.outbox import start_outbox_workers
+from app.core.order_archive import start_order_archiver
+from app.core.inventory import start_stock_hold_sweeper
+from app.core.security import get_password_hash, shutdown_hash_executor
 from datetime import datetime
+import asyncio
 
 app = FastAPI(
     title="Echo-Commerce API",
@@ -102,6 +111,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, IDEMPOTENT_REPLAYED_HEADER],
 )
 
 # 数据库连接事件
@@ -109,12 +119,42 @@ app.add_middleware(
 async def startup_db_client():
     await connect_to_mongo()
     
+    # 确保索引存在
+    try:
+        await create_indexes()
+    except Exception as e:
+        print(f"⚠️ 索引创建失败: {e}")
+    
     # 检查是否需要初始化数据
     await check_and_init_data()
+    
+    # 后台构建商品检索索引，不阻塞启动
+    app.state.search_index_task = asyncio.create_task(build_product_search_index())
+    
+    # 配置了秒杀商品时加载进程内库存并启动订单落库任务
+    app.state.flash_sale_task = await start_flash_sale()
+    
+    # 启动 outbox 事件处理任务（下单后的后续处理）
+    app.state.outbox_tasks = start_outbox_workers()
+    
+    # 定期将旧订单移入归档集合，保持订单集合与索引的大小稳定
+    app.state.order_archive_task = start_order_archiver()
+    
+    # 清理进程中断时遗留在商品上的库存预留标记
+    app.state.stock_hold_task = start_stock_hold_sweeper()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.search_index_task.cancel()
+    if app.state.flash_sale_task:
+        app.state.flash_sale_task.cancel()
+    for task in app.state.outbox_tasks:
+        task.cancel()
+    if app.state.order_archive_task:
+        app.state.order_archive_task.cancel()
+    app.state.stock_hold_task.cancel()
     await close_mongo_connection()
+    shutdown_hash_executor()
 
 # 根路径重定向到API文档
 @app.get("/")
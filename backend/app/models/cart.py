@@ -1,7 +1,8 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from datetime import datetime
+from enum import Enum
 from .base import PyObjectId
 
 class CartItemBase(BaseModel):
@@ -14,6 +15,19 @@ class CartItemCreate(CartItemBase):
 class CartItemUpdate(BaseModel):
     quantity: int = Field(..., gt=0, description="数量")
 
+class CartOperationType(str, Enum):
+    SET = "set"
+    INCREMENT = "increment"
+    REMOVE = "remove"
+
+class CartOperation(BaseModel):
+    op: CartOperationType = Field(..., description="操作类型：set 设置数量，increment 增加数量，remove 移除")
+    product_id: str = Field(..., description="商品ID")
+    quantity: Optional[int] = Field(None, gt=0, description="数量，set/increment 时必填")
+
+class CartBulkUpdate(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, description="按顺序执行的购物车操作")
+
 class CartItem(CartItemBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     user_id: str = Field(..., description="用户ID")
@@ -43,4 +57,17 @@ class CartItemResponse(BaseModel):
 class CartResponse(BaseModel):
     items: List[CartItemResponse]
     total_amount: float
-    total_items: int 
\ No newline at end of file
+    total_items: int 
+
+def cart_item_to_response(cart_item: dict, product: dict) -> dict:
+    """将购物车项与商品文档组装为 CartItemResponse 结构（可信数据，不再校验）"""
+    return {
+        "id": str(cart_item["_id"]),
+        "product_id": cart_item["product_id"],
+        "quantity": cart_item["quantity"],
+        "product_name": product["name"],
+        "product_price": product["price"],
+        "product_image_url": product["image_url"],
+        "subtotal": product["price"] * cart_item["quantity"],
+        "created_at": cart_item["created_at"]
+    }
@@ -46,6 +46,10 @@ class Order(BaseModel):
         "json_encoders": {ObjectId: str}
     }
 
+class FlashSaleOrderCreate(BaseModel):
+    product_id: str = Field(..., description="秒杀商品ID")
+    quantity: int = Field(1, gt=0, description="购买数量")
+
 class OrderResponse(BaseModel):
     id: str
     order_number: str
@@ -68,4 +72,36 @@ class OrderListResponse(BaseModel):
     
     model_config = {
         "json_encoders": {ObjectId: str}
-    } 
\ No newline at end of file
+    } 
+
+def order_item_to_response(item: dict) -> dict:
+    """将订单项文档组装为 OrderItemBase 结构（可信数据，不再校验）"""
+    return {
+        "product_id": item["product_id"],
+        "product_name": item["product_name"],
+        "product_price": item["product_price"],
+        "quantity": item["quantity"],
+        "subtotal": item["subtotal"]
+    }
+
+def order_to_response(order: dict, items: List[dict]) -> dict:
+    """将订单文档与订单项组装为 OrderResponse 结构（可信数据，不再校验）"""
+    return {
+        "id": str(order["_id"]),
+        "order_number": order["order_number"],
+        "total_amount": order["total_amount"],
+        "status": order["status"],
+        "created_at": order["created_at"],
+        "items": [order_item_to_response(item) for item in items]
+    }
+
+def order_to_list_response(order: dict, item_count: int) -> dict:
+    """将订单文档组装为 OrderListResponse 结构（可信数据，不再校验）"""
+    return {
+        "id": str(order["_id"]),
+        "order_number": order["order_number"],
+        "total_amount": order["total_amount"],
+        "status": order["status"],
+        "created_at": order["created_at"],
+        "item_count": item_count
+    }
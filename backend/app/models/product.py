@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from datetime import datetime
@@ -44,4 +44,35 @@ class ProductResponse(BaseModel):
     
     model_config = {
         "json_encoders": {ObjectId: str}
-    } 
\ No newline at end of file
+    } 
+
+def product_to_response(product: dict) -> dict:
+    """将商品文档组装为 ProductResponse 结构（数据库中的可信数据，不再校验）"""
+    return {
+        "id": str(product["_id"]),
+        "name": product["name"],
+        "description": product["description"],
+        "price": product["price"],
+        "stock": product["stock"],
+        "image_url": product["image_url"],
+        "created_at": product["created_at"],
+        "updated_at": product.get("updated_at")
+    }
+
+class ProductBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="商品ID列表")
+
+class ProductBatchItem(BaseModel):
+    id: str = Field(..., description="请求的商品ID")
+    found: bool = Field(..., description="商品是否存在")
+    product: Optional[ProductResponse] = Field(None, description="商品信息，不存在时为空")
+
+class ProductImportError(BaseModel):
+    line: int = Field(..., description="出错的行号（从1开始）")
+    error: str = Field(..., description="错误原因")
+
+class ProductImportResult(BaseModel):
+    inserted: int = Field(..., description="新增的商品数量")
+    updated: int = Field(..., description="更新的商品数量")
+    error_count: int = Field(..., description="出错的行数")
+    errors: List[ProductImportError] = Field(..., description="出错的行（最多返回前若干条）")
@@ -36,6 +36,15 @@ class UserResponse(BaseModel):
         "json_encoders": {ObjectId: str}
     }
 
+def user_to_response(user: dict) -> dict:
+    """将用户文档组装为 UserResponse 结构（可信数据，不再校验）"""
+    return {
+        "id": str(user["_id"]),
+        "username": user["username"],
+        "is_admin": user.get("is_admin", False),
+        "created_at": user["created_at"]
+    }
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
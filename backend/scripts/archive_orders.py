@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+订单归档脚本
+将创建时间超过指定天数的订单（连同订单项）移入 orders_archive 集合，与应用内定期归档任务的逻辑相同
+归档后的订单仍可通过订单详情接口读取；脚本可重复执行，中途中断后重新执行即可
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import connect_to_mongo, close_mongo_connection, get_orders_collection
+from app.core.indexes import create_indexes
+from app.core.order_archive import archive_orders_before
+from app.core.config import settings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="将旧订单移入归档集合")
+    parser.add_argument("--days", type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS, help="归档创建超过多少天的订单")
+    parser.add_argument("--batch-size", type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE, help="每批归档的订单数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待归档的订单数，不做修改")
+    args = parser.parse_args()
+
+    if args.days <= 0:
+        print("❌ --days 必须大于 0")
+        sys.exit(1)
+
+    print(f"📊 数据库: {settings.DATABASE_NAME}")
+    await connect_to_mongo()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=args.days)
+        pending = await get_orders_collection().count_documents({"created_at": {"$lt": cutoff}})
+        print(f"🔍 {cutoff.isoformat()} 之前创建的订单: {pending} 个")
+        if args.dry_run or not pending:
+            return
+
+        # 确保归档集合（压缩存储）与索引存在
+        await create_indexes()
+        archived = await archive_orders_before(cutoff, args.batch_size)
+        print(f"✅ 已归档 {archived} 个订单")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
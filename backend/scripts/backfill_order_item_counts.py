@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+订单项数量回填脚本
+为缺少 item_count 冗余字段的旧订单补齐订单项数量，补齐后订单列表不再需要额外统计
+脚本可重复执行，只处理缺少该字段的订单
+"""
+
+import asyncio
+import sys
+import os
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.order_store import EMBEDDED_ITEMS_FIELD, ITEM_COUNT_FIELD
+from app.core.config import settings
+
+BATCH_SIZE = 1000
+
+
+async def main():
+    print(f"📊 数据库: {settings.DATABASE_NAME}")
+    await connect_to_mongo()
+    try:
+        db = await get_database()
+        missing = {ITEM_COUNT_FIELD: {"$exists": False}}
+
+        # 内嵌订单项的订单直接用数组长度更新
+        result = await db.orders.update_many(
+            {**missing, EMBEDDED_ITEMS_FIELD: {"$exists": True}},
+            [{"$set": {ITEM_COUNT_FIELD: {"$size": f"${EMBEDDED_ITEMS_FIELD}"}}}]
+        )
+        print(f"✅ 内嵌订单项的订单已回填 {result.modified_count} 个")
+
+        # 订单项单独存放的订单：按 order_id 聚合后批量更新
+        pipeline = [{"$group": {"_id": "$order_id", "count": {"$sum": 1}}}]
+        operations = []
+        updated = 0
+        async for row in db.order_items.aggregate(pipeline, allowDiskUse=True):
+            if not ObjectId.is_valid(row["_id"]):
+                continue
+            operations.append(UpdateOne(
+                {"_id": ObjectId(row["_id"]), **missing},
+                {"$set": {ITEM_COUNT_FIELD: row["count"]}}
+            ))
+            if len(operations) >= BATCH_SIZE:
+                updated += (await db.orders.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            updated += (await db.orders.bulk_write(operations, ordered=False)).modified_count
+        print(f"✅ order_items 中的订单已回填 {updated} 个")
+
+        # 没有任何订单项的订单
+        result = await db.orders.update_many(missing, {"$set": {ITEM_COUNT_FIELD: 0}})
+        print(f"✅ 没有订单项的订单已回填 {result.modified_count} 个")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+秒杀下单基准测试脚本
+在独立的临时数据库中模拟大量用户同时抢购同一商品，统计秒杀模式的吞吐量与成功/售罄请求的延迟，
+可选对比普通购物车下单；同时校验订单数与剩余库存一致（不超卖）
+需要本地可用的 MongoDB（MONGODB_URL），运行结束后删除临时数据库
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi import HTTPException, Response
+from app.core.database import database, connect_to_mongo, close_mongo_connection
+from app.core.indexes import create_indexes
+from app.core.cart_store import get_cart_store
+from app.core.config import settings
+from app.core.flash_sale import flash_sale_inventory, start_flash_sale
+from app.models.order import FlashSaleOrderCreate
+from app.api.orders import create_order, create_flash_sale_order
+
+
+def percentile(values, ratio: float) -> float:
+    """计算分位数（毫秒）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] * 1000
+
+
+async def timed(call):
+    """执行一次下单，返回 (是否成功, 耗时秒)"""
+    started = time.perf_counter()
+    try:
+        await call()
+        ok = True
+    except HTTPException as error:
+        if error.status_code != 400:
+            raise
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def report(name: str, results, elapsed: float):
+    """打印吞吐量与延迟"""
+    accepted = [latency for ok, latency in results if ok]
+    rejected = [latency for ok, latency in results if not ok]
+    print(f"📈 {name}: {len(results)} 个请求耗时 {elapsed:.2f}s，吞吐 {len(results) / elapsed:.0f} 请求/秒")
+    print(f"   成功 {len(accepted)} 单，p50 {percentile(accepted, 0.5):.2f}ms，p99 {percentile(accepted, 0.99):.2f}ms")
+    print(f"   失败 {len(rejected)} 单，p50 {percentile(rejected, 0.5):.3f}ms，p99 {percentile(rejected, 0.99):.3f}ms")
+    return len(accepted)
+
+
+async def create_product(stock: int) -> dict:
+    product = {
+        "name": "秒杀压测商品",
+        "description": "秒杀下单基准测试",
+        "price": 1.0,
+        "stock": stock,
+        "image_url": "",
+        "created_at": datetime.utcnow()
+    }
+    await database.database.products.insert_one(product)
+    return product
+
+
+async def check_consistency(product: dict, initial_stock: int, accepted: int) -> bool:
+    """校验订单数、剩余库存与成功单数一致"""
+    remaining = (await database.database.products.find_one({"_id": product["_id"]}))["stock"]
+    orders = await database.database.orders.count_documents({})
+    print(f"   订单集合 {orders} 单，剩余库存 {remaining}")
+    return remaining >= 0 and orders == accepted and remaining == initial_stock - accepted
+
+
+async def run_flash_sale(requests: int, stock: int) -> bool:
+    product = await create_product(stock)
+    product_id = str(product["_id"])
+    settings.FLASH_SALE_PRODUCT_IDS_STR = product_id
+    worker = await start_flash_sale()
+
+    try:
+        order = FlashSaleOrderCreate(product_id=product_id, quantity=1)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            timed(lambda: create_flash_sale_order(order=order, current_user={"_id": ObjectId()}))
+            for _ in range(requests)
+        ))
+        accepted = report("秒杀模式", results, time.perf_counter() - started)
+        return await check_consistency(product, stock, accepted)
+    finally:
+        worker.cancel()
+        flash_sale_inventory.load({})
+
+
+async def run_baseline(requests: int, stock: int) -> bool:
+    product = await create_product(stock)
+    product_id = str(product["_id"])
+    cart_store = get_cart_store()
+    users = [ObjectId() for _ in range(requests)]
+    for user_id in users:
+        await cart_store.insert_item(str(user_id), product_id, 1)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        timed(lambda user_id=user_id: create_order(response=Response(), idempotency_key=None, current_user={"_id": user_id}))
+        for user_id in users
+    ))
+    accepted = report("普通下单", results, time.perf_counter() - started)
+    return await check_consistency(product, stock, accepted)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="秒杀下单基准测试")
+    parser.add_argument("--requests", type=int, default=5000, help="并发下单请求数")
+    parser.add_argument("--stock", type=int, default=500, help="商品初始库存")
+    parser.add_argument("--baseline", action="store_true", help="同时测试普通购物车下单作为对比")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    base_name = f"{settings.DATABASE_NAME}_flash_sale_{ObjectId()}"
+    databases = []
+    consistent = True
+
+    try:
+        scenarios = [("flash", run_flash_sale)] + ([("baseline", run_baseline)] if args.baseline else [])
+        for name, scenario in scenarios:
+            # 每个场景使用独立的临时数据库，互不影响
+            databases.append(f"{base_name}_{name}")
+            database.database = database.client[databases[-1]]
+            await create_indexes()
+            consistent = await scenario(args.requests, args.stock) and consistent
+    finally:
+        for name in databases:
+            await database.client.drop_database(name)
+        await close_mongo_connection()
+
+    if not consistent:
+        print("❌ 订单与库存不一致")
+        sys.exit(1)
+    print("🎉 没有超卖")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
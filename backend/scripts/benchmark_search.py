@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+商品检索索引基准测试脚本
+在内存中生成合成商品目录（以中文为主，混合拉丁字母型号词），构建进程内检索索引，
+输出构建耗时、进程内存峰值与检索延迟分位数；不需要 MongoDB
+"""
+
+import argparse
+import itertools
+import random
+import resource
+import sys
+import os
+import time
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.search import ProductSearchIndex
+
+# 合成文本使用的常用汉字数量（按排名加权抽取，高频字出现得更多）
+CJK_VOCABULARY_SIZE = 3000
+LATIN_WORDS = ["pro", "max", "mini", "plus", "ultra", "air", "lite", "5g", "2024", "oled"]
+
+
+def max_rss_mb() -> float:
+    """进程内存峰值（MB，Linux 下 ru_maxrss 单位为 KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] * 1000
+
+
+def synthetic_catalog(count: int, rng: random.Random):
+    """生成 (商品ID, 名称, 描述)"""
+    characters = [chr(0x4e00 + index) for index in range(CJK_VOCABULARY_SIZE)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(CJK_VOCABULARY_SIZE)))
+
+    def text(length: int) -> str:
+        return "".join(rng.choices(characters, cum_weights=cumulative, k=length))
+
+    for index in range(count):
+        name = f"{text(rng.randint(4, 12))} {rng.choice(LATIN_WORDS)}"
+        description = "，".join(text(rng.randint(8, 20)) for _ in range(rng.randint(2, 5)))
+        yield f"{index:024x}", name, description
+
+
+def main():
+    parser = argparse.ArgumentParser(description="商品检索索引基准测试")
+    parser.add_argument("--products", type=int, default=200000, help="合成商品数量")
+    parser.add_argument("--queries", type=int, default=2000, help="检索次数")
+    parser.add_argument("--limit", type=int, default=20, help="每次检索返回的商品数")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = ProductSearchIndex()
+    names = []
+    baseline_rss = max_rss_mb()
+
+    # 只统计写入索引的耗时，不含生成合成数据
+    build_seconds = 0.0
+    for product_id, name, description in synthetic_catalog(args.products, rng):
+        started = time.perf_counter()
+        index.add(product_id, name, description)
+        build_seconds += time.perf_counter() - started
+        if len(names) < 10000:
+            names.append(name)
+    print(f"🔨 {args.products} 个商品构建耗时 {build_seconds:.1f}s，进程内存峰值增加约 {max_rss_mb() - baseline_rss:.0f}MB")
+
+    # 查询：商品名称中的 2~4 个连续汉字，以及高频的拉丁字母型号词
+    cjk_queries = []
+    for _ in range(args.queries):
+        name = rng.choice(names).split(" ")[0]
+        length = min(len(name), rng.randint(2, 4))
+        start = rng.randint(0, len(name) - length)
+        cjk_queries.append(name[start:start + length])
+    scenarios = [
+        ("中文片段", cjk_queries),
+        ("高频拉丁词", [rng.choice(LATIN_WORDS) for _ in range(args.queries)]),
+        ("中文片段 + 拉丁词", [f"{query} {rng.choice(LATIN_WORDS)}" for query in cjk_queries])
+    ]
+
+    for label, queries in scenarios:
+        latencies = []
+        empty = 0
+        for query in queries:
+            started = time.perf_counter()
+            empty += not index.search(query, args.limit)
+            latencies.append(time.perf_counter() - started)
+        print(
+            f"🔍 {label}: p50 {percentile(latencies, 0.5):.2f}ms，p99 {percentile(latencies, 0.99):.2f}ms，"
+            f"最大 {max(latencies) * 1000:.2f}ms，无结果 {empty} 次"
+        )
+
+
+if __name__ == "__main__":
+    main()
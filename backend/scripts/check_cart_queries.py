@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+购物车查询次数检查脚本
+在独立的临时数据库中分别组装 1 件与 30 件商品的购物车响应，统计发往 MongoDB 的读取命令数，
+确认查询次数不随购物车商品数增长（没有逐个商品查询的 N+1 问题）
+需要本地可用的 MongoDB（MONGODB_URL），运行结束后删除临时数据库
+"""
+
+import asyncio
+import sys
+import os
+from collections import Counter
+from datetime import datetime
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import motor.motor_asyncio
+from bson import ObjectId
+from pymongo import monitoring
+from app.core.database import database, close_mongo_connection
+from app.core.config import settings
+from app.core.product_cache import invalidate_product
+from app.api.cart import _build_cart_response
+
+# 统计的读取命令
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+
+CART_SIZES = [1, 30]
+
+
+class CommandCounter(monitoring.CommandListener):
+    """按集合统计发出的读取命令数"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        if event.command_name in READ_COMMANDS:
+            collection = event.command.get("collection") if event.command_name == "getMore" else event.command[event.command_name]
+            self.counts[collection] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def count_queries(counter: CommandCounter, cart_items, cold: bool):
+    """组装一次购物车响应，返回 (按集合的命令数, 响应中的商品数)；cold 时先清空商品缓存"""
+    if cold:
+        for cart_item in cart_items:
+            invalidate_product(cart_item["product_id"])
+    counter.counts.clear()
+    cart = await _build_cart_response(cart_items)
+    return dict(counter.counts), len(cart["items"])
+
+
+async def main():
+    counter = CommandCounter()
+    database.client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[counter])
+    database_name = f"{settings.DATABASE_NAME}_cart_queries_{ObjectId()}"
+    database.database = database.client[database_name]
+    print(f"📊 临时数据库: {database_name}")
+
+    failures = 0
+    try:
+        now = datetime.utcnow()
+        products = [
+            {"name": f"商品 {index}", "description": "", "price": 10.0 + index, "stock": 100,
+             "image_url": None, "created_at": now, "updated_at": now}
+            for index in range(max(CART_SIZES))
+        ]
+        result = await database.database.products.insert_many(products)
+        product_ids = [str(product_id) for product_id in result.inserted_ids]
+
+        for cold in (True, False):
+            label = "缓存未命中" if cold else "缓存命中"
+            counts = {}
+            for size in CART_SIZES:
+                cart_items = [
+                    {"_id": ObjectId(), "product_id": product_id, "quantity": 1, "created_at": now}
+                    for product_id in product_ids[:size]
+                ]
+                counts[size], returned = await count_queries(counter, cart_items, cold)
+                print(f"🔍 {label} {size:>2} 件商品: {sum(counts[size].values())} 次查询 {counts[size] or ''}")
+                if returned != size:
+                    print(f"❌ 返回 {returned} 件商品，应为 {size} 件")
+                    failures += 1
+
+            totals = {size: sum(count.values()) for size, count in counts.items()}
+            if len(set(totals.values())) != 1:
+                print(f"❌ {label}: 查询次数随购物车商品数增长 {totals}")
+                failures += 1
+    finally:
+        await database.client.drop_database(database_name)
+        await close_mongo_connection()
+
+    if failures:
+        sys.exit(1)
+    print("🎉 购物车查询次数与商品数无关")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
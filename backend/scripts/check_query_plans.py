@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+查询计划检查脚本
+对商品列表与订单列表（包括归档集合）支持的每种过滤/排序组合执行 explain()，确认没有查询退化为全表扫描
+"""
+
+import asyncio
+import itertools
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.indexes import create_indexes
+from app.core.config import settings
+from app.api.products import PRODUCT_SORTS, build_product_filter
+from app.api.orders import ORDER_SORT, build_order_filter
+from app.models.order import OrderStatus
+
+
+def collect_stages(plan: dict):
+    """递归收集查询计划中的所有阶段名"""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(collect_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(collect_stages(child))
+    return [stage for stage in stages if stage]
+
+
+def find_index_names(plan: dict):
+    """递归收集查询计划中用到的索引名"""
+    names = [plan["indexName"]] if "indexName" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            names.extend(find_index_names(plan[key]))
+    for child in plan.get("inputStages", []):
+        names.extend(find_index_names(child))
+    return names
+
+
+async def explain_find(db, collection: str, query: dict, sort: list, label: str) -> bool:
+    """解释一次带排序的分页查询，打印执行计划并返回是否命中索引"""
+    explain = await db.command(
+        "explain",
+        {"find": collection, "filter": query, "sort": dict(sort), "limit": 10},
+        verbosity="queryPlanner"
+    )
+    winning_plan = explain["queryPlanner"]["winningPlan"]
+    stages = collect_stages(winning_plan)
+    indexes = ", ".join(find_index_names(winning_plan)) or "-"
+
+    ok = "COLLSCAN" not in stages
+    mark = "✅" if ok else "❌"
+    print(f"{mark} {label}: {' <- '.join(stages)} [{indexes}]")
+    return ok
+
+
+async def main():
+    """检查商品列表与订单列表所有支持的查询组合"""
+    print(f"📊 数据库: {settings.DATABASE_NAME}")
+    await connect_to_mongo()
+    await create_indexes()
+    db = await get_database()
+
+    price_ranges = [(None, None), (100, None), (None, 5000), (100, 5000)]
+    stock_filters = [None, True, False]
+    failures = 0
+
+    for sort, (price_min, price_max), in_stock in itertools.product(PRODUCT_SORTS, price_ranges, stock_filters):
+        query = build_product_filter(price_min, price_max, in_stock)
+        label = f"products sort={sort:<12} price=({price_min}, {price_max}) in_stock={in_stock}"
+        failures += 0 if await explain_find(db, "products", query, PRODUCT_SORTS[sort], label) else 1
+
+    # 订单列表：用户订单（按 user_id）与管理员订单（全部），各自叠加状态与时间范围过滤；
+    # 列表翻过订单集合后在归档集合中执行相同的查询
+    now = datetime.utcnow()
+    date_ranges = [(None, None), (now - timedelta(days=30), None), (now - timedelta(days=30), now)]
+    for collection, user_id, order_status, (created_from, created_to) in itertools.product(
+        ["orders", "orders_archive"], [None, "000000000000000000000000"], [None, OrderStatus.PAID], date_ranges
+    ):
+        query = build_order_filter(order_status, created_from, created_to)
+        if user_id:
+            query["user_id"] = user_id
+        label = f"{collection} user={bool(user_id)} status={order_status and order_status.value} range={created_from is not None, created_to is not None}"
+        failures += 0 if await explain_find(db, collection, query, ORDER_SORT, label) else 1
+
+    await close_mongo_connection()
+
+    if failures:
+        print(f"❌ {failures} 个查询组合退化为全表扫描")
+        sys.exit(1)
+    print("🎉 所有查询组合均命中索引")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,36 +16,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.core.database import get_database
 from app.core.security import get_password_hash
 from app.core.config import settings
+from app.core.indexes import create_indexes
 
 
 async def check_and_create_indexes():
     """创建必要的数据库索引"""
     print("📋 检查并创建数据库索引...")
     
-    db = await get_database()
-    
-    # 用户集合索引
-    await db.users.create_index("username", unique=True)
-    print("✅ 用户集合索引创建完成")
-    
-    # 商品集合索引
-    await db.products.create_index("name")
-    await db.products.create_index([("created_at", -1)])
-    print("✅ 商品集合索引创建完成")
-    
-    # 购物车集合索引
-    await db.cart.create_index([("user_id", 1), ("product_id", 1)], unique=True)
-    print("✅ 购物车集合索引创建完成")
-    
-    # 订单集合索引
-    await db.orders.create_index("user_id")
-    await db.orders.create_index("order_number", unique=True)
-    await db.orders.create_index([("created_at", -1)])
-    print("✅ 订单集合索引创建完成")
-    
-    # 订单项集合索引
-    await db.order_items.create_index("order_id")
-    print("✅ 订单项集合索引创建完成")
+    await create_indexes()
+    print("✅ 用户、商品、购物车、订单、订单项集合索引创建完成")
 
 
 async def init_admin_user():
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+购物车存储迁移脚本
+在 lines（cart 集合，每个购物车项一个文档）与 document（carts 集合，每个用户一个文档）两种存储模式之间迁移数据
+迁移完成后修改 CART_STORAGE_MODE 并重启应用；脚本可重复执行，目标集合中同一用户的数据会被覆盖
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+from datetime import datetime
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ReplaceOne, UpdateOne
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.indexes import create_indexes
+from app.core.config import settings
+
+BATCH_SIZE = 500
+
+ITEM_FIELDS = ("_id", "product_id", "quantity", "created_at", "updated_at")
+
+
+async def migrate_to_document(db, drop_source: bool):
+    """cart -> carts：按用户聚合购物车项"""
+    pipeline = [
+        {"$sort": {"user_id": 1, "created_at": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "items": {"$push": {field: f"${field}" for field in ITEM_FIELDS}},
+            "updated_at": {"$max": "$updated_at"}
+        }}
+    ]
+
+    operations = []
+    users = 0
+    async for cart in db.cart.aggregate(pipeline, allowDiskUse=True):
+        operations.append(ReplaceOne(
+            {"user_id": cart["_id"]},
+            {"user_id": cart["_id"], "items": cart["items"], "updated_at": cart["updated_at"] or datetime.utcnow()},
+            upsert=True
+        ))
+        users += 1
+        if len(operations) >= BATCH_SIZE:
+            await db.carts.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.carts.bulk_write(operations, ordered=False)
+
+    print(f"✅ 已迁移 {users} 个用户的购物车到 carts 集合")
+    if drop_source:
+        result = await db.cart.delete_many({})
+        print(f"🗑️  已删除 cart 集合中的 {result.deleted_count} 条购物车项")
+
+
+async def migrate_to_lines(db, drop_source: bool):
+    """carts -> cart：展开每个用户的购物车项"""
+    operations = []
+    items = 0
+    async for cart in db.carts.find({}):
+        for item in cart.get("items", []):
+            line = {field: item[field] for field in ITEM_FIELDS if field in item}
+            line["user_id"] = cart["user_id"]
+            line_id = line.pop("_id")
+            operations.append(UpdateOne(
+                {"user_id": cart["user_id"], "product_id": line["product_id"]},
+                {"$set": line, "$setOnInsert": {"_id": line_id}},
+                upsert=True
+            ))
+            items += 1
+            if len(operations) >= BATCH_SIZE:
+                await db.cart.bulk_write(operations, ordered=False)
+                operations = []
+    if operations:
+        await db.cart.bulk_write(operations, ordered=False)
+
+    print(f"✅ 已迁移 {items} 条购物车项到 cart 集合")
+    if drop_source:
+        result = await db.carts.delete_many({})
+        print(f"🗑️  已删除 carts 集合中的 {result.deleted_count} 个购物车文档")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="在两种购物车存储模式之间迁移数据")
+    parser.add_argument("--to", choices=["document", "lines"], required=True, help="目标存储模式")
+    parser.add_argument("--drop-source", action="store_true", help="迁移完成后删除源集合中的数据")
+    args = parser.parse_args()
+
+    print(f"📊 数据库: {settings.DATABASE_NAME}")
+    await connect_to_mongo()
+    try:
+        await create_indexes()
+        db = await get_database()
+        if args.to == "document":
+            await migrate_to_document(db, args.drop_source)
+        else:
+            await migrate_to_lines(db, args.drop_source)
+        print(f"👉 请将 CART_STORAGE_MODE 设置为 {args.to} 并重启应用")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+订单项存储迁移脚本
+在 separate（order_items 集合单独存放）与 embedded（订单项内嵌在订单文档的 items 字段）两种存储之间迁移已有订单
+两种存储的订单应用都可以读取，因此迁移可以在应用运行时进行；脚本可重复执行
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.order_store import EMBEDDED_ITEMS_FIELD
+from app.core.config import settings
+
+BATCH_SIZE = 500
+
+ITEM_FIELDS = ("product_id", "product_name", "product_price", "quantity", "subtotal")
+
+
+async def migrate_to_embedded(db):
+    """order_items -> orders.items，已内嵌的订单项从 order_items 中删除，避免统计时重复计算"""
+    migrated = 0
+    while True:
+        orders = await db.orders.find(
+            {EMBEDDED_ITEMS_FIELD: {"$exists": False}}, {"_id": 1}
+        ).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not orders:
+            break
+
+        order_ids = [str(order["_id"]) for order in orders]
+        items_by_order = {order_id: [] for order_id in order_ids}
+        async for item in db.order_items.find({"order_id": {"$in": order_ids}}):
+            items_by_order[item["order_id"]].append({field: item[field] for field in ITEM_FIELDS})
+
+        await db.orders.bulk_write([
+            UpdateOne(
+                {"_id": order["_id"], EMBEDDED_ITEMS_FIELD: {"$exists": False}},
+                {"$set": {EMBEDDED_ITEMS_FIELD: items_by_order[str(order["_id"])]}}
+            )
+            for order in orders
+        ], ordered=False)
+
+        await db.order_items.delete_many({"order_id": {"$in": order_ids}})
+        migrated += len(orders)
+        print(f"  已迁移 {migrated} 个订单")
+
+    # 清理上次执行中断时已内嵌但尚未从 order_items 删除的订单项
+    order_ids = []
+    async for order in db.orders.find({EMBEDDED_ITEMS_FIELD: {"$exists": True}}, {"_id": 1}):
+        order_ids.append(str(order["_id"]))
+        if len(order_ids) >= BATCH_SIZE:
+            await db.order_items.delete_many({"order_id": {"$in": order_ids}})
+            order_ids = []
+    if order_ids:
+        await db.order_items.delete_many({"order_id": {"$in": order_ids}})
+
+    print(f"✅ 共 {migrated} 个订单的订单项已内嵌到订单文档")
+
+
+async def migrate_to_separate(db):
+    """orders.items -> order_items"""
+    migrated = 0
+    while True:
+        orders = await db.orders.find(
+            {EMBEDDED_ITEMS_FIELD: {"$exists": True}}, {EMBEDDED_ITEMS_FIELD: 1}
+        ).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not orders:
+            break
+
+        # 先删除可能由中断的上次执行写入的订单项，保证重复执行不会产生重复数据
+        order_ids = [str(order["_id"]) for order in orders]
+        await db.order_items.delete_many({"order_id": {"$in": order_ids}})
+        items = [
+            dict(item, order_id=str(order["_id"]))
+            for order in orders
+            for item in order[EMBEDDED_ITEMS_FIELD]
+        ]
+        if items:
+            await db.order_items.insert_many(items)
+        await db.orders.update_many(
+            {"_id": {"$in": [order["_id"] for order in orders]}},
+            {"$unset": {EMBEDDED_ITEMS_FIELD: ""}}
+        )
+        migrated += len(orders)
+        print(f"  已迁移 {migrated} 个订单")
+
+    print(f"✅ 共 {migrated} 个订单的订单项已迁移到 order_items 集合")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="在两种订单项存储之间迁移已有订单")
+    parser.add_argument("--to", choices=["embedded", "separate"], required=True, help="目标存储模式")
+    args = parser.parse_args()
+
+    print(f"📊 数据库: {settings.DATABASE_NAME}")
+    await connect_to_mongo()
+    try:
+        db = await get_database()
+        if args.to == "embedded":
+            await migrate_to_embedded(db)
+        else:
+            await migrate_to_separate(db)
+        print(f"👉 请将 ORDER_STORAGE_MODE 设置为 {args.to}，新订单将按该模式写入")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+下单并发压测脚本
+在独立的临时数据库中让大量用户同时对同一商品下单，验证库存不会被超卖
+需要本地可用的 MongoDB（MONGODB_URL），运行结束后删除临时数据库
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime
+
+# 添加父目录到路径，以便导入应用模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi import HTTPException, Response
+from app.core.database import database, connect_to_mongo, close_mongo_connection
+from app.core.indexes import create_indexes
+from app.core.cart_store import get_cart_store
+from app.core.config import settings
+from app.api.orders import create_order
+
+
+async def checkout(user_id: ObjectId):
+    """以指定用户身份下单，返回是否成功"""
+    try:
+        await create_order(response=Response(), idempotency_key=None, current_user={"_id": user_id})
+        return True
+    except HTTPException as error:
+        if error.status_code != 400:
+            raise
+        return False
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="并发下单压测，验证库存不超卖")
+    parser.add_argument("--orders", type=int, default=300, help="并发下单的用户数")
+    parser.add_argument("--stock", type=int, default=100, help="商品初始库存")
+    parser.add_argument("--quantity", type=int, default=1, help="每个用户购买的数量")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    stress_database = f"{settings.DATABASE_NAME}_stress_{ObjectId()}"
+    database.database = database.client[stress_database]
+    print(f"📊 临时数据库: {stress_database}")
+
+    try:
+        await create_indexes()
+        product = {
+            "name": "压测商品",
+            "description": "并发下单压测",
+            "price": 1.0,
+            "stock": args.stock,
+            "image_url": "",
+            "created_at": datetime.utcnow()
+        }
+        await database.database.products.insert_one(product)
+        product_id = str(product["_id"])
+
+        cart_store = get_cart_store()
+        users = [ObjectId() for _ in range(args.orders)]
+        for user_id in users:
+            await cart_store.insert_item(str(user_id), product_id, args.quantity)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(checkout(user_id) for user_id in users))
+        elapsed = time.perf_counter() - started
+
+        succeeded = sum(results)
+        remaining = (await database.database.products.find_one({"_id": product["_id"]}))["stock"]
+        orders = await database.database.orders.count_documents({})
+        expected = min(args.orders, args.stock // args.quantity)
+
+        print(f"⏱️  {args.orders} 个并发下单耗时 {elapsed:.2f}s")
+        print(f"✅ 成功 {succeeded} 单，订单集合 {orders} 单，剩余库存 {remaining}")
+
+        if remaining < 0 or orders != succeeded or remaining != args.stock - succeeded * args.quantity:
+            print("❌ 库存与订单不一致，出现超卖")
+            sys.exit(1)
+        if succeeded != expected:
+            print(f"❌ 成功单数应为 {expected}")
+            sys.exit(1)
+        print("🎉 没有超卖")
+    finally:
+        await database.client.drop_database(stress_database)
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -20,11 +20,21 @@ import {
   User
 } from 'lucide-react';
 
+// /api/admin/stats 中与订单相关的字段
+interface OrderStats {
+  total_orders: number;
+  total_revenue: number;
+  order_status_stats: Record<string, number>;
+}
+
 export default function AdminOrdersPage() {
   const { user, loading: authLoading } = useAuth();
   const router = useRouter();
   const [orders, setOrders] = useState<OrderListItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [orderStats, setOrderStats] = useState<OrderStats | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
 
   useEffect(() => {
@@ -43,8 +53,14 @@ export default function AdminOrdersPage() {
   const loadOrders = async () => {
     try {
       setLoading(true);
-      const data = await adminAPI.getAllOrders();
-      setOrders(data);
+      // 列表分页加载，统计数据来自后端汇总（覆盖全部订单）
+      const [page, systemStats] = await Promise.all([
+        adminAPI.getAllOrders(),
+        adminAPI.getStats(),
+      ]);
+      setOrders(page.orders);
+      setNextCursor(page.nextCursor);
+      setOrderStats(systemStats);
     } catch (error) {
       console.error('Failed to load orders:', error);
       showError('加载订单列表失败');
@@ -53,6 +69,22 @@ export default function AdminOrdersPage() {
     }
   };
 
+  // 加载更早的订单
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await adminAPI.getAllOrders(nextCursor);
+      setOrders(prev => [...prev, ...page.orders]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Failed to load more orders:', error);
+      showError('加载更多订单失败');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // 权限检查
   if (!authLoading && (!user || !user.is_admin)) {
     return <PermissionError />;
@@ -104,14 +136,16 @@ export default function AdminOrdersPage() {
     }
   };
 
-  // 统计数据
+  // 统计数据（来自 /api/admin/stats，不受列表分页影响）
+  const statusStats = orderStats?.order_status_stats ?? {};
   const stats = {
-    total: orders.length,
-    pending: orders.filter(o => o.status.toLowerCase() === 'pending').length,
-    paid: orders.filter(o => o.status.toLowerCase() === 'paid').length,
-    shipped: orders.filter(o => o.status.toLowerCase() === 'shipped').length,
-    delivered: orders.filter(o => o.status.toLowerCase() === 'delivered').length,
-    totalRevenue: orders.reduce((sum, order) => sum + order.total_amount, 0),
+    total: orderStats?.total_orders ?? 0,
+    pending: statusStats.pending ?? 0,
+    paid: statusStats.paid ?? 0,
+    shipped: statusStats.shipped ?? 0,
+    delivered: statusStats.delivered ?? 0,
+    cancelled: statusStats.cancelled ?? 0,
+    totalRevenue: orderStats?.total_revenue ?? 0,
   };
 
   return (
@@ -132,7 +166,7 @@ export default function AdminOrdersPage() {
               <div>
                 <h1 className="text-xl font-bold text-gray-900">订单管理</h1>
                 <p className="text-sm text-gray-600">
-                  共 {orders.length} 个订单
+                  共 {stats.total} 个订单
                 </p>
               </div>
             </div>
@@ -292,6 +326,17 @@ export default function AdminOrdersPage() {
                 </tbody>
               </table>
             </div>
+            {nextCursor && (
+              <div className="px-6 py-4 border-t border-gray-200 text-center">
+                <button
+                  onClick={loadMoreOrders}
+                  disabled={loadingMore}
+                  className="px-4 py-2 border border-gray-300 rounded-lg text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                >
+                  {loadingMore ? '加载中...' : '加载更多订单'}
+                </button>
+              </div>
+            )}
           </div>
         )}
 
@@ -316,9 +361,7 @@ export default function AdminOrdersPage() {
               <div className="text-sm text-gray-500">已完成</div>
             </div>
             <div className="text-center">
-              <div className="text-2xl font-bold text-red-600">
-                {orders.filter(o => o.status.toLowerCase() === 'cancelled').length}
-              </div>
+              <div className="text-2xl font-bold text-red-600">{stats.cancelled}</div>
               <div className="text-sm text-gray-500">已取消</div>
             </div>
           </div>
@@ -24,6 +24,13 @@ export async function PUT(
   return handleRequest(request, params.path, 'PUT');
 }
 
+export async function PATCH(
+  request: NextRequest,
+  { params }: { params: { path: string[] } }
+) {
+  return handleRequest(request, params.path, 'PATCH');
+}
+
 export async function DELETE(
   request: NextRequest,
   { params }: { params: { path: string[] } }
@@ -53,6 +60,18 @@ async function handleRequest(
       headers['Authorization'] = authHeader;
     }
 
+    // 转发幂等键（下单重试时使用）
+    const idempotencyKey = request.headers.get('idempotency-key');
+    if (idempotencyKey) {
+      headers['Idempotency-Key'] = idempotencyKey;
+    }
+
+    // 转发条件请求头（后端内容未变化时返回 304）
+    const ifNoneMatch = request.headers.get('if-none-match');
+    if (ifNoneMatch) {
+      headers['If-None-Match'] = ifNoneMatch;
+    }
+
     // 准备请求体
     let body: string | undefined;
     if (method !== 'GET' && method !== 'DELETE') {
@@ -60,19 +79,49 @@ async function handleRequest(
     }
 
     // 发送请求到后端
+    // 不使用 Next.js 的数据缓存，缓存由浏览器按 ETag / Cache-Control 重新验证
     const response = await fetch(backendUrl, {
       method,
       headers,
       body,
+      cache: 'no-store',
     });
 
-    // 获取响应数据
-    const responseData = await response.text();
-    
     // 构建响应头
     const responseHeaders = new Headers();
+    
+    // 转发缓存相关响应头
+    const etag = response.headers.get('etag');
+    if (etag) {
+      responseHeaders.set('ETag', etag);
+    }
+    const cacheControl = response.headers.get('cache-control');
+    if (cacheControl) {
+      responseHeaders.set('Cache-Control', cacheControl);
+    }
+    
+    // 304 没有响应体
+    if (response.status === 304) {
+      return new NextResponse(null, {
+        status: 304,
+        headers: responseHeaders,
+      });
+    }
+    
+    // 获取响应数据
+    const responseData = await response.text();
     responseHeaders.set('Content-Type', 'application/json');
     
+    // 转发分页游标（列表接口的下一页游标通过响应头返回）
+    const nextCursor = response.headers.get('x-next-cursor');
+    if (nextCursor) {
+      responseHeaders.set('X-Next-Cursor', nextCursor);
+    }
+    const replayed = response.headers.get('idempotent-replayed');
+    if (replayed) {
+      responseHeaders.set('Idempotent-Replayed', replayed);
+    }
+    
     // 转发CORS头
     const corsHeaders = response.headers.get('access-control-allow-origin');
     if (corsHeaders) {
@@ -9,7 +9,9 @@ import Link from 'next/link'
 
 export default function OrdersPage() {
   const [orders, setOrders] = useState<OrderListItem[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [isLoading, setIsLoading] = useState(true)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [error, setError] = useState('')
   const { user } = useAuth()
   const router = useRouter()
@@ -25,8 +27,9 @@ export default function OrdersPage() {
   const fetchOrders = async () => {
     try {
       setIsLoading(true)
-      const response = await orderAPI.getOrders()
-      setOrders(response)
+      const page = await orderAPI.getOrders()
+      setOrders(page.orders)
+      setNextCursor(page.nextCursor)
     } catch (err) {
       setError('获取订单信息失败')
       console.error('Error fetching orders:', err)
@@ -35,6 +38,21 @@ export default function OrdersPage() {
     }
   }
 
+  // 加载更早的订单
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return
+    try {
+      setIsLoadingMore(true)
+      const page = await orderAPI.getOrders(nextCursor)
+      setOrders(prev => [...prev, ...page.orders])
+      setNextCursor(page.nextCursor)
+    } catch (err) {
+      console.error('Error loading more orders:', err)
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'pending':
@@ -204,6 +222,18 @@ export default function OrdersPage() {
           ))}
         </div>
         
+        {nextCursor && (
+          <div className="mt-6 text-center">
+            <button
+              onClick={loadMoreOrders}
+              disabled={isLoadingMore}
+              className="px-6 py-2 border border-gray-300 rounded-md text-gray-700 hover:bg-gray-50 transition-colors disabled:opacity-50"
+            >
+              {isLoadingMore ? '加载中...' : '加载更多'}
+            </button>
+          </div>
+        )}
+        
         <div className="mt-8 text-center">
           <Link
             href="/products"
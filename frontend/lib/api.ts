@@ -1,6 +1,6 @@
 import axios from 'axios';
 import Cookies from 'js-cookie';
-import type { Product, Cart, CartItem, Order, OrderListItem, AuthResponse, User } from '@/types';
+import type { Product, Cart, CartItem, CartOperation, Order, OrderListPage, AuthResponse, User } from '@/types';
 
 // 使用相对路径，通过Next.js API路由代理
 const API_URL = '/api';
@@ -115,18 +115,25 @@ export const cartAPI = {
   clearCart: async (): Promise<void> => {
     await api.delete('/cart/clear');
   },
+
+  bulkUpdate: async (operations: CartOperation[]): Promise<Cart> => {
+    const response = await api.patch('/cart', { operations });
+    return response.data;
+  },
 };
 
 // 订单相关API
 export const orderAPI = {
-  createOrder: async (): Promise<Order> => {
-    const response = await api.post('/orders');
+  createOrder: async (idempotencyKey?: string): Promise<Order> => {
+    const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined;
+    const response = await api.post('/orders', undefined, { headers });
     return response.data;
   },
 
-  getOrders: async (): Promise<OrderListItem[]> => {
-    const response = await api.get('/orders');
-    return response.data;
+  // 游标分页：下一页游标通过 X-Next-Cursor 响应头返回
+  getOrders: async (cursor?: string, limit = 20): Promise<OrderListPage> => {
+    const response = await api.get('/orders', { params: { limit, cursor } });
+    return { orders: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
   },
 
   getOrder: async (id: string): Promise<Order> => {
@@ -162,9 +169,9 @@ export const adminAPI = {
     return response.data;
   },
 
-  getAllOrders: async () => {
-    const response = await api.get('/admin/orders');
-    return response.data;
+  getAllOrders: async (cursor?: string, limit = 20): Promise<OrderListPage> => {
+    const response = await api.get('/admin/orders', { params: { limit, cursor } });
+    return { orders: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
   },
 
   getOrder: async (orderId: string) => {
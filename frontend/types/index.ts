@@ -33,6 +33,12 @@ export interface Cart {
   total_items: number;
 }
 
+export interface CartOperation {
+  op: 'set' | 'increment' | 'remove';
+  product_id: string;
+  quantity?: number;
+}
+
 export interface OrderItem {
   product_id: string;
   product_name: string;
@@ -59,6 +65,12 @@ export interface OrderListItem {
   item_count: number;
 }
 
+// 订单列表的一页，nextCursor 为空表示没有更多订单
+export interface OrderListPage {
+  orders: OrderListItem[];
+  nextCursor: string | null;
+}
+
 export interface AuthResponse {
   access_token: string;
   token_type: string;